@@ -27,7 +27,7 @@ logger = logging.getLogger(__name__)
 
 def process_file(args):
     """Process a single image or PDF file."""
-    from scanner.ocr import MistralOCR
+    from scanner.ocr import get_ocr
     from scanner.parser import GradeParser
 
     file_path = Path(args.file)
@@ -41,7 +41,7 @@ def process_file(args):
 
     # Initialize OCR
     try:
-        ocr = MistralOCR()
+        ocr = get_ocr()
     except ValueError as e:
         print(f"Error: {e}")
         print("\nSet MISTRAL_API_KEY in your .env file")
@@ -165,8 +165,12 @@ def process_email(args):
 
             print(f"\nFound {len(messages)} unread emails with attachments:")
 
-            for msg in messages:
-                attachments = processor.get_attachments(msg["id"])
+            attachments_by_message = processor.get_attachments_batch(
+                [msg["id"] for msg in messages],
+                include_data=False,
+            )
+
+            for attachments in attachments_by_message.values():
                 if attachments:
                     att = attachments[0]
                     print(f"\n  From: {att.sender}")
@@ -198,7 +202,9 @@ def process_email(args):
 
         for result in results:
             print(f"\n  {result.attachment.filename}:")
-            if result.success:
+            if result.duplicate:
+                print(f"    Duplicate of document ID {result.document_id}")
+            elif result.success:
                 if result.parsed and result.parsed.title:
                     print(f"    Title: {result.parsed.title}")
                 if result.parsed and result.parsed.score:
@@ -8,15 +8,42 @@ Stores tokens in dropbox_token.json for reuse across sessions.
 
 import os
 import json
+import threading
 from typing import Optional
 from pathlib import Path
 
 import dropbox
+import requests
 from dropbox import DropboxOAuth2FlowNoRedirect
 
 # Default paths
 DEFAULT_TOKEN_FILE = "dropbox_token.json"
 
+# Pooled connections shared by every Dropbox client in the process
+HTTP_POOL_SIZE = 16
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the shared HTTP session for Dropbox clients.
+
+    Clients built from separate DropboxAuth instances (status checks,
+    processors, the daemon) reuse the same kept-alive TLS connections
+    instead of each opening their own.
+
+    Returns:
+        requests.Session from dropbox.create_session
+    """
+    global _http_session
+
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = dropbox.create_session(max_connections=HTTP_POOL_SIZE)
+        return _http_session
+
 
 class DropboxAuth:
     """
@@ -94,6 +121,7 @@ class DropboxAuth:
                         oauth2_refresh_token=refresh_token,
                         app_key=self.app_key,
                         app_secret=self.app_secret,
+                        session=get_http_session(),
                     )
 
                     # Test if token is valid by checking refresh
@@ -111,7 +139,10 @@ class DropboxAuth:
 
                 elif access_token:
                     # Try with just access token (may be expired)
-                    client = dropbox.Dropbox(oauth2_access_token=access_token)
+                    client = dropbox.Dropbox(
+                        oauth2_access_token=access_token,
+                        session=get_http_session(),
+                    )
                     try:
                         # Test if valid
                         client.users_get_current_account()
@@ -176,6 +207,7 @@ class DropboxAuth:
                 oauth2_refresh_token=oauth_result.refresh_token,
                 app_key=self.app_key,
                 app_secret=self.app_secret,
+                session=get_http_session(),
             )
 
         except Exception as e:
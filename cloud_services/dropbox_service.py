@@ -6,11 +6,14 @@ Provides Dropbox API operations for scanning workflow.
 Uses App Folder access - all paths are relative to /Apps/<app_name>/.
 """
 
+import hashlib
+import io
 import logging
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 import dropbox
+import requests
 from dropbox.exceptions import ApiError
 from dropbox.files import FileMetadata, FolderMetadata
 
@@ -23,6 +26,25 @@ SUPPORTED_EXTENSIONS = {
     ".jpg", ".jpeg", ".png", ".webp", ".gif", ".pdf"
 }
 
+# MIME type for each supported extension
+EXTENSION_MIME_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "gif": "image/gif",
+    "pdf": "application/pdf",
+}
+
+# MIME types that can be sent to OCR
+SUPPORTED_MIME_TYPES = frozenset(EXTENSION_MIME_TYPES.values())
+
+# Largest page files/list_folder will return
+LIST_FOLDER_PAGE_SIZE = 2000
+
+# Read size for streamed downloads (matches hashlib.file_digest's buffer)
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
 
 class DropboxService:
     """
@@ -84,8 +106,8 @@ class DropboxService:
         files = []
 
         try:
-            # List folder contents
-            result = self.client.files_list_folder(path)
+            # List folder contents (largest pages, fewest round trips)
+            result = self.client.files_list_folder(path, limit=LIST_FOLDER_PAGE_SIZE)
 
             while True:
                 for entry in result.entries:
@@ -132,19 +154,12 @@ class DropboxService:
             "createdTime": metadata.server_modified.isoformat(),
             "path_display": metadata.path_display,
             "path_lower": metadata.path_lower,
+            "content_hash": metadata.content_hash,  # Dropbox block hash of the content
         }
 
     def _ext_to_mime(self, ext: str) -> str:
         """Convert file extension to MIME type."""
-        mime_map = {
-            "jpg": "image/jpeg",
-            "jpeg": "image/jpeg",
-            "png": "image/png",
-            "webp": "image/webp",
-            "gif": "image/gif",
-            "pdf": "application/pdf",
-        }
-        return mime_map.get(ext, "application/octet-stream")
+        return EXTENSION_MIME_TYPES.get(ext, "application/octet-stream")
 
     def download_file(self, file_path: str) -> bytes:
         """
@@ -165,6 +180,54 @@ class DropboxService:
             logger.error(f"Failed to download {path}: {e}")
             raise
 
+    def download_stream(self, file_path: str) -> requests.Response:
+        """
+        Open a streaming download for a file.
+
+        The body is not read until the caller iterates over it, so large
+        files can be processed chunk by chunk.
+
+        Args:
+            file_path: Full path to file (or path_display from list_files)
+
+        Returns:
+            HTTP response to read from (close it, or use it as a context manager)
+        """
+        path = self._normalize_path(file_path)
+
+        try:
+            metadata, response = self.client.files_download(path)
+            return response
+        except ApiError as e:
+            logger.error(f"Failed to download {path}: {e}")
+            raise
+
+    def download_file_hashed(self, file_path: str) -> Tuple[bytes, str]:
+        """
+        Download file content and compute its SHA256 hash in one pass.
+
+        Each chunk is hashed as it arrives, so the digest is ready as soon
+        as the download finishes.
+
+        Args:
+            file_path: Full path to file (or path_display from list_files)
+
+        Returns:
+            Tuple of (file content, SHA256 hex digest)
+        """
+        # Must stay SHA256: file_hash values are compared across Drive,
+        # Dropbox and earlier runs. hashlib uses OpenSSL, which picks the
+        # SHA-NI / ARMv8 instructions itself when the CPU has them.
+        hasher = hashlib.sha256()
+        buffer = io.BytesIO()
+
+        with self.download_stream(file_path) as response:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                hasher.update(chunk)
+                buffer.write(chunk)
+
+        return buffer.getvalue(), hasher.hexdigest()
+
     def get_file_metadata(self, file_path: str) -> Dict[str, Any]:
         """
         Get file metadata.
@@ -253,6 +316,36 @@ class DropboxService:
                 return folder_path
             raise
 
+    def list_shared_links(self) -> Dict[str, str]:
+        """
+        Get every existing shared link in the app folder.
+
+        Pages through sharing/list_shared_links once, so callers can look
+        up links for many files without a request per file.
+
+        Returns:
+            Dict of lowercase path to shared link URL
+        """
+        links = {}
+
+        try:
+            result = self.client.sharing_list_shared_links()
+
+            while True:
+                for link in result.links:
+                    if link.path_lower:
+                        links[link.path_lower] = link.url
+
+                if result.has_more:
+                    result = self.client.sharing_list_shared_links(cursor=result.cursor)
+                else:
+                    break
+
+        except ApiError as e:
+            logger.error(f"Failed to list shared links: {e}")
+
+        return links
+
     def get_shared_link(self, file_path: str) -> str:
         """
         Get or create a shared link for a file.
@@ -87,6 +87,8 @@ class DropboxConfig:
     student_folders: dict = field(default_factory=dict)  # student_name -> folder_path
     # Detection confidence threshold (0-100)
     confidence_threshold: int = 70
+    # Concurrent OCR workers (1 = process files one at a time)
+    max_workers: int = 4
 
     def is_valid(self) -> bool:
         return bool(self.app_key and self.app_secret)
@@ -150,6 +152,8 @@ class ScannerConfig:
     ocr_provider: str = "mistral"  # mistral, tesseract, or google_vision
     mistral_api_key: str = ""
     google_vision_credentials: str = ""
+    # Downscale images larger than this (pixels, longest side) before OCR; 0 = off
+    max_ocr_dim: int = 2048
 
     def is_valid(self) -> bool:
         if self.ocr_provider == "mistral":
@@ -230,6 +234,7 @@ def load_config() -> Config:
     config.dropbox.move_to_processed = os.getenv("DROPBOX_MOVE_TO_PROCESSED", "true").lower() == "true"
     config.dropbox.scan_folder = os.getenv("DROPBOX_SCAN_FOLDER", "")
     config.dropbox.confidence_threshold = int(os.getenv("DROPBOX_CONFIDENCE_THRESHOLD", "70"))
+    config.dropbox.max_workers = int(os.getenv("DROPBOX_MAX_WORKERS", "4"))
 
     # Load per-student Dropbox folder paths (format: DROPBOX_{NAME}_FOLDER)
     for key, value in os.environ.items():
@@ -256,6 +261,7 @@ def load_config() -> Config:
     config.scanner.ocr_provider = os.getenv("OCR_PROVIDER", "mistral")
     config.scanner.mistral_api_key = os.getenv("MISTRAL_API_KEY", "")
     config.scanner.google_vision_credentials = os.getenv("GOOGLE_VISION_CREDENTIALS", "")
+    config.scanner.max_ocr_dim = int(os.getenv("OCR_MAX_IMAGE_DIM", "2048"))
 
     return config
 
@@ -334,6 +340,7 @@ def print_config_status(config: Config):
     print(f"  Polling Interval: {config.dropbox.polling_interval}s")
     print(f"  Move to Processed: {config.dropbox.move_to_processed}")
     print(f"  Confidence Threshold: {config.dropbox.confidence_threshold}%")
+    print(f"  Max Workers: {config.dropbox.max_workers}")
     if config.dropbox.scan_folder:
         print(f"  Scan Folder: {config.dropbox.scan_folder}")
     print(f"  Student Folders: {len(config.dropbox.student_folders)}")
@@ -356,6 +363,7 @@ def print_config_status(config: Config):
     print(f"  OCR Provider: {config.scanner.ocr_provider}")
     if config.scanner.ocr_provider == "mistral":
         print(f"  Mistral API Key: {'*' * 20}..." if config.scanner.mistral_api_key else "  Mistral API Key: NOT SET")
+    print(f"  Max OCR Image Size: {config.scanner.max_ocr_dim or 'original'}")
     print(f"  Status: {'OK' if config.scanner.is_valid() else 'NOT CONFIGURED'}")
 
 
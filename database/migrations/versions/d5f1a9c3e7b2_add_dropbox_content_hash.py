@@ -0,0 +1,37 @@
+"""add_dropbox_content_hash
+
+Revision ID: d5f1a9c3e7b2
+Revises: c4e7a8b92d1f
+Create Date: 2026-01-17 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f1a9c3e7b2'
+down_revision: Union[str, Sequence[str], None] = 'c4e7a8b92d1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add dropbox_content_hash column for duplicate detection before download."""
+    op.add_column(
+        'scanned_documents',
+        sa.Column('dropbox_content_hash', sa.String(64), nullable=True),
+    )
+    op.create_index(
+        'ix_scanned_dropbox_content_hash',
+        'scanned_documents',
+        ['dropbox_content_hash'],
+    )
+
+
+def downgrade() -> None:
+    """Remove dropbox_content_hash column."""
+    op.drop_index('ix_scanned_dropbox_content_hash', table_name='scanned_documents')
+    op.drop_column('scanned_documents', 'dropbox_content_hash')
@@ -0,0 +1,38 @@
+"""add_scanned_lookup_indexes
+
+Revision ID: e8b2c6d4f1a3
+Revises: d5f1a9c3e7b2
+Create Date: 2026-01-17 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b2c6d4f1a3'
+down_revision: Union[str, Sequence[str], None] = 'd5f1a9c3e7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add indexes for Dropbox path lookups and pending-document queries."""
+    op.create_index(
+        'ix_scanned_dropbox_path',
+        'scanned_documents',
+        ['dropbox_path'],
+    )
+    op.create_index(
+        'ix_scanned_source_student',
+        'scanned_documents',
+        ['source', 'student_id'],
+    )
+
+
+def downgrade() -> None:
+    """Remove Dropbox path and pending-document indexes."""
+    op.drop_index('ix_scanned_source_student', table_name='scanned_documents')
+    op.drop_index('ix_scanned_dropbox_path', table_name='scanned_documents')
@@ -179,6 +179,7 @@ class ScannedDocument(Base):
     # Dropbox storage
     dropbox_path = Column(String(1000))  # Full path in Dropbox app folder
     dropbox_url = Column(String(1000))   # Shared link URL
+    dropbox_content_hash = Column(String(64), index=True)  # Dropbox content_hash (checked before download)
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -187,6 +188,8 @@ class ScannedDocument(Base):
         Index("ix_scanned_student_date", "student_id", "scan_date"),
         Index("ix_scanned_unmatched", "assignment_id", postgresql_where=(assignment_id.is_(None))),
         Index("ix_scanned_pending", "status", postgresql_where=(status == "pending")),
+        Index("ix_scanned_dropbox_path", "dropbox_path"),
+        Index("ix_scanned_source_student", "source", "student_id"),
     )
 
     # Relationships
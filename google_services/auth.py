@@ -11,6 +11,7 @@ Handles OAuth2 flow, token storage, and credential management for:
 
 import os
 import json
+import threading
 from pathlib import Path
 from typing import Optional, List, Any
 
@@ -82,7 +83,20 @@ class GoogleAuth:
         self.token_file = token_file or DEFAULT_TOKEN_FILE
         self.scopes = scopes or self._get_all_scopes()
         self._credentials: Optional[Credentials] = None
-        self._services: dict = {}
+        self._local = threading.local()
+
+    @property
+    def _services(self) -> dict:
+        """
+        Services built for the current thread.
+
+        Each service wraps its own httplib2 connection, which keeps TLS
+        connections alive but must not be shared between threads.
+        """
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = self._local.services = {}
+        return services
 
     def _find_credentials_file(self) -> str:
         """Find credentials file in common locations."""
@@ -231,6 +245,9 @@ class GoogleAuth:
         """
         Get an authenticated Google API service.
 
+        Services are cached per thread, so worker threads can make API
+        calls concurrently without sharing a connection.
+
         Args:
             service_name: One of 'gmail', 'calendar', 'docs', 'drive'
 
@@ -290,7 +307,7 @@ class GoogleAuth:
                 os.remove(self.token_file)
 
             self._credentials = None
-            self._services = {}
+            self._local = threading.local()
             return True
 
         except Exception as e:
@@ -36,14 +36,11 @@ class GmailService:
             auth: GoogleAuth instance (creates one if not provided)
         """
         self._auth = auth or GoogleAuth()
-        self._service = None
 
     @property
     def service(self):
-        """Get the Gmail API service (lazy load)."""
-        if self._service is None:
-            self._service = self._auth.get_service("gmail")
-        return self._service
+        """Get the Gmail API service for the current thread (lazy load)."""
+        return self._auth.get_service("gmail")
 
     def get_user_email(self) -> Optional[str]:
         """Get the authenticated user's email address."""
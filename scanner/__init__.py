@@ -10,7 +10,7 @@ Components:
 - drive_processor: Process scanned documents from Google Drive
 """
 
-from .ocr import MistralOCR, OCRResult
+from .ocr import MistralOCR, OCRResult, get_ocr
 from .parser import GradeParser, ParsedDocument
 from .matcher import AssignmentMatcher, MatchResult
 from .email_processor import EmailProcessor, ProcessingResult
@@ -20,6 +20,7 @@ from .student_detector import StudentDetector, StudentDetection
 __all__ = [
     "MistralOCR",
     "OCRResult",
+    "get_ocr",
     "GradeParser",
     "ParsedDocument",
     "AssignmentMatcher",
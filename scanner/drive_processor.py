@@ -8,12 +8,10 @@ and shared folder with smart student detection.
 """
 
 import logging
-import tempfile
-import os
 import hashlib
 from datetime import datetime
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 from sqlalchemy.orm import Session
 
@@ -22,7 +20,7 @@ from google_services.drive_service import DriveService, SUPPORTED_MIME_TYPES
 from database.models import Student, ScannedDocument
 from database.connection import get_session
 from config import get_config
-from .ocr import MistralOCR, OCRResult
+from .ocr import MistralOCR, OCRResult, get_ocr
 from .parser import GradeParser, ParsedDocument
 from .matcher import AssignmentMatcher, MatchResult
 from .student_detector import StudentDetector, StudentDetection
@@ -92,6 +90,12 @@ class DriveProcessor:
         self._parser = GradeParser()
         self._student_detector = None
 
+        # OCR handler for each supported MIME type
+        self._ocr_handlers = {
+            mime_type: self._ocr_pdf if mime_type == "application/pdf" else self._ocr_image
+            for mime_type in SUPPORTED_MIME_TYPES
+        }
+
     @property
     def drive(self) -> DriveService:
         """Get Drive service (lazy load)."""
@@ -103,7 +107,7 @@ class DriveProcessor:
     def ocr(self) -> MistralOCR:
         """Get OCR instance (lazy load)."""
         if self._ocr is None:
-            self._ocr = MistralOCR()
+            self._ocr = get_ocr()
         return self._ocr
 
     @property
@@ -124,6 +128,31 @@ class DriveProcessor:
         """Compute SHA256 hash of file content."""
         return hashlib.sha256(content).hexdigest()
 
+    def _ocr_image(self, drive_file: DriveFile, content: bytes) -> OCRResult:
+        """OCR an image download (the OCR client downscales large images)."""
+        return self.ocr.process_image_bytes(content, drive_file.name, drive_file.mime_type)
+
+    def _ocr_pdf(self, drive_file: DriveFile, content: bytes) -> OCRResult:
+        """OCR a PDF download (uploaded straight from memory)."""
+        return self.ocr.process_pdf_bytes(content, drive_file.name)
+
+    def _run_ocr(self, drive_file: DriveFile, content: bytes) -> OCRResult:
+        """
+        Run OCR using the handler registered for the file's MIME type.
+
+        Args:
+            drive_file: DriveFile being processed
+            content: Downloaded file content
+
+        Returns:
+            OCRResult from the matching handler
+        """
+        handler = self._ocr_handlers.get(drive_file.mime_type)
+        if handler is None:
+            # Unlisted types fall back to their MIME family
+            handler = self._ocr_image if drive_file.mime_type.startswith("image/") else self._ocr_pdf
+        return handler(drive_file, content)
+
     def _check_duplicate(self, file_hash: str) -> Optional[ScannedDocument]:
         """
         Check if a file with this hash already exists in the database.
@@ -186,6 +215,7 @@ class DriveProcessor:
         folder_id: str,
         confidence_threshold: int = 70,
         move_files: bool = True,
+        matcher: Optional[AssignmentMatcher] = None,
     ) -> DriveProcessingResult:
         """
         Process a file with smart student detection.
@@ -195,6 +225,7 @@ class DriveProcessor:
             folder_id: Source folder ID
             confidence_threshold: Minimum confidence for auto-assignment
             move_files: Whether to move files after processing
+            matcher: Shared AssignmentMatcher (one is created if omitted)
 
         Returns:
             DriveProcessingResult with detection and processing data
@@ -224,24 +255,7 @@ class DriveProcessor:
                 )
 
             # Process through OCR
-            if drive_file.mime_type.startswith("image/"):
-                ocr_result = self.ocr.process_image_bytes(
-                    file_content,
-                    drive_file.name,
-                    drive_file.mime_type,
-                )
-            else:
-                # For PDFs, save to temp file
-                with tempfile.NamedTemporaryFile(
-                    suffix=".pdf", delete=False
-                ) as f:
-                    f.write(file_content)
-                    temp_path = f.name
-
-                try:
-                    ocr_result = self.ocr.process_file(temp_path)
-                finally:
-                    os.unlink(temp_path)
+            ocr_result = self._run_ocr(drive_file, file_content)
 
             if not ocr_result.success:
                 return DriveProcessingResult(
@@ -276,7 +290,7 @@ class DriveProcessor:
             # Match to assignment (if we have a student)
             match = None
             if student_id:
-                matcher = AssignmentMatcher(self.session)
+                matcher = matcher or AssignmentMatcher(self.session)
                 match = matcher.find_match(parsed, student_id)
 
             # Save to database
@@ -339,6 +353,7 @@ class DriveProcessor:
         move_to_processed: bool = True,
         processed_folder_id: Optional[str] = None,
         source_folder_id: Optional[str] = None,
+        matcher: Optional[AssignmentMatcher] = None,
     ) -> DriveProcessingResult:
         """
         Process a single file from Drive (with known student).
@@ -349,6 +364,7 @@ class DriveProcessor:
             move_to_processed: Whether to move file after processing
             processed_folder_id: Destination folder for processed files
             source_folder_id: Source folder ID (for moving)
+            matcher: Shared AssignmentMatcher (one is created if omitted)
 
         Returns:
             DriveProcessingResult with all processing data
@@ -378,24 +394,7 @@ class DriveProcessor:
                 )
 
             # Process through OCR
-            if drive_file.mime_type.startswith("image/"):
-                ocr_result = self.ocr.process_image_bytes(
-                    file_content,
-                    drive_file.name,
-                    drive_file.mime_type,
-                )
-            else:
-                # For PDFs, save to temp file
-                with tempfile.NamedTemporaryFile(
-                    suffix=".pdf", delete=False
-                ) as f:
-                    f.write(file_content)
-                    temp_path = f.name
-
-                try:
-                    ocr_result = self.ocr.process_file(temp_path)
-                finally:
-                    os.unlink(temp_path)
+            ocr_result = self._run_ocr(drive_file, file_content)
 
             if not ocr_result.success:
                 return DriveProcessingResult(
@@ -414,7 +413,7 @@ class DriveProcessor:
             parsed = self._parser.parse(ocr_result.full_text)
 
             # Match to assignment
-            matcher = AssignmentMatcher(self.session)
+            matcher = matcher or AssignmentMatcher(self.session)
             match = matcher.find_match(parsed, student_id)
 
             # Save to database
@@ -465,6 +464,32 @@ class DriveProcessor:
                 error=str(e),
             )
 
+    def _grade_discrepancy(
+        self,
+        parsed: ParsedDocument,
+        match: Optional[MatchResult],
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Compare the detected score against the matched Canvas assignment.
+
+        Computed up front so both values are passed to the ScannedDocument
+        constructor instead of being set on the tracked instance afterwards.
+
+        Args:
+            parsed: Parsed document data
+            match: Assignment match result (may be None)
+
+        Returns:
+            Tuple of (canvas_score, score_discrepancy), either may be None
+        """
+        if not (match and match.assignment and match.assignment.score is not None):
+            return None, None
+
+        canvas_score = match.assignment.score
+        if parsed.score and parsed.score.earned:
+            return canvas_score, parsed.score.earned - canvas_score
+        return canvas_score, None
+
     def _save_to_database(
         self,
         drive_file: DriveFile,
@@ -475,6 +500,8 @@ class DriveProcessor:
         file_hash: Optional[str] = None,
     ) -> int:
         """Save processed document to database (known student)."""
+        canvas_score, score_discrepancy = self._grade_discrepancy(parsed, match)
+
         doc = ScannedDocument(
             student_id=student_id,
             assignment_id=match.assignment.id if match.assignment else None,
@@ -491,6 +518,9 @@ class DriveProcessor:
             detected_max_score=parsed.score.possible if parsed.score else None,
             match_confidence=match.confidence,
             match_method=match.method,
+            # Grade discrepancy vs Canvas
+            canvas_score=canvas_score,
+            score_discrepancy=score_discrepancy,
             # Drive-specific fields
             drive_file_id=drive_file.file_id,
             drive_url=drive_file.web_view_link,
@@ -498,12 +528,6 @@ class DriveProcessor:
             file_hash=file_hash,
         )
 
-        # Check for grade discrepancy
-        if match.assignment and match.assignment.score is not None:
-            doc.canvas_score = match.assignment.score
-            if parsed.score and parsed.score.earned:
-                doc.score_discrepancy = parsed.score.earned - match.assignment.score
-
         self.session.add(doc)
         self.session.commit()
 
@@ -521,6 +545,8 @@ class DriveProcessor:
         file_hash: Optional[str] = None,
     ) -> int:
         """Save processed document to database with detection info."""
+        canvas_score, score_discrepancy = self._grade_discrepancy(parsed, match)
+
         doc = ScannedDocument(
             student_id=student_id,
             assignment_id=match.assignment.id if match and match.assignment else None,
@@ -537,6 +563,9 @@ class DriveProcessor:
             detected_max_score=parsed.score.possible if parsed.score else None,
             match_confidence=match.confidence if match else 0,
             match_method=match.method if match else "none",
+            # Grade discrepancy vs Canvas
+            canvas_score=canvas_score,
+            score_discrepancy=score_discrepancy,
             # Drive-specific fields
             drive_file_id=drive_file.file_id,
             drive_url=drive_file.web_view_link,
@@ -548,12 +577,6 @@ class DriveProcessor:
             detection_method=detection.method,
         )
 
-        # Check for grade discrepancy
-        if match and match.assignment and match.assignment.score is not None:
-            doc.canvas_score = match.assignment.score
-            if parsed.score and parsed.score.earned:
-                doc.score_discrepancy = parsed.score.earned - match.assignment.score
-
         self.session.add(doc)
         self.session.commit()
 
@@ -582,6 +605,11 @@ class DriveProcessor:
         new_files = self.get_new_files(folder_id)
         logger.info(f"Found {len(new_files)} new files to process")
 
+        # One matcher per run so each student's assignments load once, and
+        # no detections remembered from before assignments were last synced
+        matcher = AssignmentMatcher(self.session)
+        self.student_detector.clear_cache()
+
         # Process each file with detection
         for drive_file in new_files:
             result = self.process_file_with_detection(
@@ -589,6 +617,7 @@ class DriveProcessor:
                 folder_id=folder_id,
                 confidence_threshold=confidence_threshold,
                 move_files=move_files,
+                matcher=matcher,
             )
             results.append(result)
 
@@ -624,6 +653,9 @@ class DriveProcessor:
         new_files = self.get_new_files(folder_id)
         logger.info(f"Found {len(new_files)} new files to process")
 
+        # One matcher per run so the student's assignments load once
+        matcher = AssignmentMatcher(self.session)
+
         # Process each file
         for drive_file in new_files:
             result = self.process_file(
@@ -632,6 +664,7 @@ class DriveProcessor:
                 move_to_processed=move_to_processed,
                 processed_folder_id=processed_folder_id,
                 source_folder_id=folder_id,
+                matcher=matcher,
             )
             results.append(result)
 
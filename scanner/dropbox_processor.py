@@ -6,30 +6,34 @@ Monitors Dropbox app folder for new scans, processes them through OCR,
 and stores results in the database. Supports smart student detection.
 """
 
+import functools
 import logging
-import tempfile
-import os
-import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Callable, Iterable, Optional, List, Tuple, Set, Dict
 
 from sqlalchemy.orm import Session
 
 from cloud_services.dropbox_auth import DropboxAuth
-from cloud_services.dropbox_service import DropboxService
+from cloud_services.dropbox_service import DropboxService, SUPPORTED_MIME_TYPES
 from database.models import Student, ScannedDocument
 from database.connection import get_session
 from config import get_config
-from .ocr import MistralOCR, OCRResult
+from .ocr import MistralOCR, OCRResult, get_ocr
 from .parser import GradeParser, ParsedDocument
 from .matcher import AssignmentMatcher, MatchResult
 from .student_detector import StudentDetector, StudentDetection
 
 logger = logging.getLogger(__name__)
 
+# Saved documents per commit when processing a folder
+COMMIT_BATCH_SIZE = 20
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class DropboxFile:
     """Represents a file from Dropbox."""
     file_path: str  # Full path in Dropbox (used as ID)
@@ -38,9 +42,35 @@ class DropboxFile:
     size: int
     created_time: datetime
     web_link: str = ""
+    content_hash: str = ""  # Dropbox content_hash from the listing
+    path_lower: str = ""  # Dropbox's lowercased path (shared link lookups)
+
+
+def _parse_created_time(created_str: str) -> datetime:
+    """Parse a listing timestamp (ISO 8601, may end in Z); now if missing or invalid."""
+    if created_str:
+        try:
+            return datetime.fromisoformat(created_str.replace("Z", "+00:00"))
+        except ValueError:
+            pass
+    return datetime.now()
+
+
+def _to_dropbox_file(f: dict) -> DropboxFile:
+    """Build a DropboxFile from a list_files entry."""
+    return DropboxFile(
+        file_path=f["path_display"],
+        name=f["name"],
+        mime_type=f["mimeType"],
+        size=f.get("size", 0),
+        created_time=_parse_created_time(f.get("createdTime", "")),
+        web_link="",  # Will get shared link if needed
+        content_hash=f.get("content_hash") or "",
+        path_lower=f.get("path_lower") or "",
+    )
 
 
-@dataclass
+@dataclass(slots=True)
 class DropboxProcessingResult:
     """Result of processing a Dropbox file."""
     dropbox_file: DropboxFile
@@ -55,6 +85,19 @@ class DropboxProcessingResult:
     file_hash: Optional[str] = None  # SHA256 hash of file content
 
 
+@dataclass(slots=True)
+class _PipelineItem:
+    """A file moving through the download -> OCR -> save pipeline."""
+    index: int  # Position in the listing (results keep this order)
+    dropbox_file: DropboxFile
+    file_content: Optional[bytes] = None  # None once OCR has consumed it
+    file_hash: Optional[str] = None  # None if the download was skipped
+    ocr_result: Optional[OCRResult] = None
+    parsed: Optional[ParsedDocument] = None
+    error: Optional[str] = None
+    repeat: bool = False  # Same content as an earlier file in this run
+
+
 class DropboxProcessor:
     """
     Processes scanned documents from Dropbox.
@@ -102,7 +145,7 @@ class DropboxProcessor:
     def ocr(self) -> MistralOCR:
         """Get OCR instance (lazy load)."""
         if self._ocr is None:
-            self._ocr = MistralOCR()
+            self._ocr = get_ocr()
         return self._ocr
 
     @property
@@ -119,60 +162,158 @@ class DropboxProcessor:
             self._student_detector = StudentDetector(self.session)
         return self._student_detector
 
-    def _compute_file_hash(self, content: bytes) -> str:
-        """Compute SHA256 hash of file content."""
-        return hashlib.sha256(content).hexdigest()
-
-    def _check_duplicate(self, file_hash: str) -> Optional[ScannedDocument]:
-        """Check if a file with this hash already exists in the database."""
-        return self.session.query(ScannedDocument).filter_by(
+    def _check_duplicate(self, file_hash: str) -> Optional[int]:
+        """Get the ID of a stored document with this hash, if any."""
+        return self.session.query(ScannedDocument.id).filter_by(
             file_hash=file_hash
-        ).first()
+        ).limit(1).scalar()
 
-    def get_new_files(self, folder_path: str = "") -> List[DropboxFile]:
+    def get_new_files(
+        self,
+        folder_path: str = "",
+        files: Optional[List[dict]] = None,
+    ) -> List[DropboxFile]:
         """
         Get files from Dropbox folder that haven't been processed.
 
         Args:
             folder_path: Path within app folder (empty = root)
+            files: Listing already fetched with list_files (fetched if omitted)
 
         Returns:
             List of DropboxFile objects for unprocessed files
         """
         # Get all files in folder
-        files = self.dropbox.list_files(folder_path)
+        if files is None:
+            files = self.dropbox.list_files(folder_path)
+
+        # Drop files OCR can't use before anything is downloaded
+        eligible = [
+            f for f in files
+            if f["mimeType"] in SUPPORTED_MIME_TYPES and f.get("size", 0) > 0
+        ]
+        if len(eligible) < len(files):
+            logger.info(f"Skipping {len(files) - len(eligible)} empty or unsupported files")
+        files = eligible
+        if not files:
+            return []
+
+        # Look up every listed path in a single query
+        paths = [f["path_display"] for f in files]
+        known_paths = {
+            path for (path,) in self.session.query(ScannedDocument.dropbox_path)
+            .filter(ScannedDocument.dropbox_path.in_(paths))
+        }
 
         # Filter out already processed files
-        new_files = []
-        for f in files:
-            # Check if this path exists in database
-            existing = self.session.query(ScannedDocument).filter_by(
-                dropbox_path=f["path_display"]
-            ).first()
-
-            if existing is None:
-                # Parse datetime
-                created_str = f.get("createdTime", "")
-                if created_str:
-                    try:
-                        created_time = datetime.fromisoformat(
-                            created_str.replace("Z", "+00:00")
-                        )
-                    except ValueError:
-                        created_time = datetime.now()
-                else:
-                    created_time = datetime.now()
-
-                new_files.append(DropboxFile(
-                    file_path=f["path_display"],
-                    name=f["name"],
-                    mime_type=f["mimeType"],
-                    size=f.get("size", 0),
-                    created_time=created_time,
-                    web_link="",  # Will get shared link if needed
-                ))
-
-        return new_files
+        return [
+            _to_dropbox_file(f)
+            for f in files
+            if f["path_display"] not in known_paths
+        ]
+
+    def _stored_hashes(self, column, hashes: Iterable[str]) -> Set[str]:
+        """
+        Get which of the given hashes are already stored (one query).
+
+        Args:
+            column: ScannedDocument.file_hash or .dropbox_content_hash
+            hashes: Hashes to look up
+
+        Returns:
+            The subset of hashes found in the column
+        """
+        hashes = set(hashes)
+        if not hashes:
+            return set()
+        return {
+            stored for (stored,) in
+            self.session.query(column).filter(column.in_(hashes)).distinct()
+        }
+
+    def _ocr_file(self, dropbox_file: DropboxFile, file_content: bytes) -> OCRResult:
+        """Run OCR on downloaded file content."""
+        if dropbox_file.mime_type.startswith("image/"):
+            return self.ocr.process_image_bytes(
+                file_content,
+                dropbox_file.name,
+                dropbox_file.mime_type,
+            )
+
+        return self.ocr.process_pdf_bytes(file_content, dropbox_file.name)
+
+    def _duplicate_result(
+        self,
+        dropbox_file: DropboxFile,
+        file_hash: str,
+    ) -> Optional[DropboxProcessingResult]:
+        """Build a duplicate result if this hash is already stored, else None."""
+        existing_id = self._check_duplicate(file_hash)
+        if existing_id is None:
+            return None
+
+        return self._build_duplicate_result(dropbox_file, existing_id, file_hash)
+
+    def _content_duplicate_result(
+        self,
+        dropbox_file: DropboxFile,
+    ) -> Optional[DropboxProcessingResult]:
+        """
+        Build a duplicate result from the Dropbox content_hash, else None.
+
+        The content_hash comes with the folder listing, so a hit here means
+        the file never needs to be downloaded or hashed.
+        """
+        if not dropbox_file.content_hash:
+            return None
+
+        existing_id = self.session.query(ScannedDocument.id).filter_by(
+            dropbox_content_hash=dropbox_file.content_hash
+        ).limit(1).scalar()
+        if existing_id is None:
+            return None
+
+        return self._build_duplicate_result(dropbox_file, existing_id)
+
+    def _build_duplicate_result(
+        self,
+        dropbox_file: DropboxFile,
+        document_id: int,
+        file_hash: Optional[str] = None,
+    ) -> DropboxProcessingResult:
+        """Build a duplicate result pointing at an existing document."""
+        logger.info(f"Duplicate detected: {dropbox_file.name} matches existing document ID {document_id}")
+        return DropboxProcessingResult(
+            dropbox_file=dropbox_file,
+            ocr_result=None,
+            parsed=None,
+            match=None,
+            student_detection=None,
+            document_id=document_id,
+            success=True,
+            status="duplicate",
+            error=f"Duplicate of document ID {document_id}",
+            file_hash=file_hash,
+        )
+
+    def _failed_result(
+        self,
+        dropbox_file: DropboxFile,
+        error: Optional[str],
+        ocr_result: Optional[OCRResult] = None,
+    ) -> DropboxProcessingResult:
+        """Build a failed result."""
+        return DropboxProcessingResult(
+            dropbox_file=dropbox_file,
+            ocr_result=ocr_result,
+            parsed=None,
+            match=None,
+            student_detection=None,
+            document_id=None,
+            success=False,
+            status="failed",
+            error=error,
+        )
 
     def process_file_with_detection(
         self,
@@ -180,6 +321,12 @@ class DropboxProcessor:
         source_folder: str,
         confidence_threshold: int = 70,
         move_files: bool = True,
+        known_hashes: Optional[Set[str]] = None,
+        student_detector: Optional[StudentDetector] = None,
+        matcher: Optional[AssignmentMatcher] = None,
+        known_content_hashes: Optional[Set[str]] = None,
+        uncommitted: Optional[List[Tuple[DropboxProcessingResult, Optional[str]]]] = None,
+        shared_links: Optional[Callable[[], Dict[str, str]]] = None,
     ) -> DropboxProcessingResult:
         """
         Process a file with smart student detection.
@@ -189,6 +336,18 @@ class DropboxProcessor:
             source_folder: Source folder path
             confidence_threshold: Minimum confidence for auto-assignment
             move_files: Whether to move files after processing
+            known_hashes: Preloaded file hashes; the database is only queried
+                on a hit (when omitted, every file is checked in the database)
+            student_detector: StudentDetector to use (defaults to self.student_detector)
+            matcher: AssignmentMatcher to use (one is created if omitted)
+            known_content_hashes: Preloaded Dropbox content hashes, used the
+                same way as known_hashes but checked before downloading
+            uncommitted: Batch to add the saved document to; the caller
+                commits it with _commit_saved (when omitted, the document
+                is committed and the file moved immediately)
+            shared_links: Returns existing shared links by lowercase path,
+                checked before creating one (when omitted, each saved file
+                gets its link with its own request)
 
         Returns:
             DropboxProcessingResult with detection and processing data
@@ -196,142 +355,194 @@ class DropboxProcessor:
         logger.info(f"Processing Dropbox file with detection: {dropbox_file.name}")
 
         try:
-            # Download file
-            file_content = self.dropbox.download_file(dropbox_file.file_path)
-
-            # Compute hash and check for duplicates
-            file_hash = self._compute_file_hash(file_content)
-            existing = self._check_duplicate(file_hash)
-            if existing:
-                logger.info(f"Duplicate detected: {dropbox_file.name} matches existing document ID {existing.id}")
-                return DropboxProcessingResult(
-                    dropbox_file=dropbox_file,
-                    ocr_result=None,
-                    parsed=None,
-                    match=None,
-                    student_detection=None,
-                    document_id=existing.id,
-                    success=True,
-                    status="duplicate",
-                    error=f"Duplicate of document ID {existing.id}",
-                    file_hash=file_hash,
-                )
+            # Skip the download entirely if the listing's content_hash is known
+            if known_content_hashes is None or dropbox_file.content_hash in known_content_hashes:
+                duplicate = self._content_duplicate_result(dropbox_file)
+                if duplicate:
+                    return duplicate
+
+            # Download file, hashing as it streams in
+            file_content, file_hash = self.dropbox.download_file_hashed(dropbox_file.file_path)
+
+            # Check for duplicates
+            if known_hashes is None or file_hash in known_hashes:
+                duplicate = self._duplicate_result(dropbox_file, file_hash)
+                if duplicate:
+                    return duplicate
+
+            # Process through OCR, then drop the file bytes before the
+            # rest of the processing
+            ocr_result = self._ocr_file(dropbox_file, file_content)
+            del file_content
+
+            return self._complete_file(
+                dropbox_file=dropbox_file,
+                file_hash=file_hash,
+                ocr_result=ocr_result,
+                confidence_threshold=confidence_threshold,
+                move_files=move_files,
+                known_hashes=known_hashes,
+                student_detector=student_detector,
+                matcher=matcher,
+                known_content_hashes=known_content_hashes,
+                uncommitted=uncommitted,
+                shared_links=shared_links,
+            )
 
-            # Process through OCR
-            if dropbox_file.mime_type.startswith("image/"):
-                ocr_result = self.ocr.process_image_bytes(
-                    file_content,
-                    dropbox_file.name,
-                    dropbox_file.mime_type,
-                )
-            else:
-                # For PDFs, save to temp file
-                with tempfile.NamedTemporaryFile(
-                    suffix=".pdf", delete=False
-                ) as f:
-                    f.write(file_content)
-                    temp_path = f.name
+        except Exception as e:
+            logger.error(f"Failed to process {dropbox_file.name}: {e}")
+            return self._failed_result(dropbox_file, str(e))
 
-                try:
-                    ocr_result = self.ocr.process_file(temp_path)
-                finally:
-                    os.unlink(temp_path)
+    def _complete_file(
+        self,
+        dropbox_file: DropboxFile,
+        file_hash: str,
+        ocr_result: OCRResult,
+        confidence_threshold: int,
+        move_files: bool,
+        known_hashes: Optional[Set[str]] = None,
+        student_detector: Optional[StudentDetector] = None,
+        matcher: Optional[AssignmentMatcher] = None,
+        known_content_hashes: Optional[Set[str]] = None,
+        uncommitted: Optional[List[Tuple[DropboxProcessingResult, Optional[str]]]] = None,
+        parsed: Optional[ParsedDocument] = None,
+        shared_links: Optional[Callable[[], Dict[str, str]]] = None,
+    ) -> DropboxProcessingResult:
+        """
+        Parse, detect, match, save and move a file that has been through OCR.
 
-            if not ocr_result.success:
-                return DropboxProcessingResult(
-                    dropbox_file=dropbox_file,
-                    ocr_result=ocr_result,
-                    parsed=None,
-                    match=None,
-                    student_detection=None,
-                    document_id=None,
-                    success=False,
-                    status="failed",
-                    error=ocr_result.error,
-                )
+        This is the only processing step that uses the database session.
+        The file is moved only after its document has been committed.
+        Pass `parsed` if the OCR text has already been parsed, and
+        `shared_links` to look up an existing shared link before creating one.
+
+        Returns:
+            DropboxProcessingResult for the file
+        """
+        if not ocr_result.success:
+            return self._failed_result(dropbox_file, ocr_result.error, ocr_result)
 
-            # Parse OCR text
+        # Parse OCR text
+        if parsed is None:
             parsed = self._parser.parse(ocr_result.full_text)
 
-            # Detect student
-            detection = self.student_detector.detect(parsed)
-
-            # Determine status based on detection confidence
-            if detection.is_confident and detection.confidence >= confidence_threshold:
-                status = "processed"
-                student_id = detection.student.id
-                # Move to student's folder (use first name)
-                dest_folder = detection.student.name.split()[0]
-            else:
-                status = "pending"
-                student_id = detection.student.id if detection.student else None
-                dest_folder = "Pending"
-
-            # Match to assignment (if we have a student)
-            match = None
-            if student_id:
-                matcher = AssignmentMatcher(self.session)
-                match = matcher.find_match(parsed, student_id)
-
-            # Get shared link for the file
-            web_link = ""
+        # Detect student
+        student_detector = student_detector or self.student_detector
+        detection = student_detector.detect(parsed)
+
+        # Determine status based on detection confidence
+        if detection.is_confident and detection.confidence >= confidence_threshold:
+            status = "processed"
+            student_id = detection.student.id
+            # Move to student's folder (use first name)
+            dest_folder = detection.student.name.split()[0]
+        else:
+            status = "pending"
+            student_id = detection.student.id if detection.student else None
+            dest_folder = "Pending"
+
+        # Match to assignment (if we have a student)
+        match = None
+        if student_id:
+            matcher = matcher or AssignmentMatcher(self.session)
+            match = matcher.find_match(parsed, student_id)
+
+        # Get shared link for the file, reusing an existing one if listed
+        web_link = dropbox_file.web_link
+        if not web_link and shared_links is not None and dropbox_file.path_lower:
+            web_link = shared_links().get(dropbox_file.path_lower, "")
+        if not web_link:
             try:
                 web_link = self.dropbox.get_shared_link(dropbox_file.file_path)
             except Exception as e:
                 logger.warning(f"Could not get shared link: {e}")
 
-            # Save to database
-            document_id = self._save_to_database_with_detection(
-                dropbox_file=dropbox_file,
-                ocr_result=ocr_result,
-                parsed=parsed,
-                match=match,
-                detection=detection,
-                student_id=student_id,
-                status=status,
-                file_hash=file_hash,
-                web_link=web_link,
-            )
+        # Save to database
+        document_id = self._save_to_database_with_detection(
+            dropbox_file=dropbox_file,
+            ocr_result=ocr_result,
+            parsed=parsed,
+            match=match,
+            detection=detection,
+            student_id=student_id,
+            status=status,
+            file_hash=file_hash,
+            web_link=web_link,
+        )
+        if known_hashes is not None:
+            known_hashes.add(file_hash)
+        if known_content_hashes is not None and dropbox_file.content_hash:
+            known_content_hashes.add(dropbox_file.content_hash)
+
+        result = DropboxProcessingResult(
+            dropbox_file=dropbox_file,
+            ocr_result=ocr_result,
+            parsed=parsed,
+            match=match,
+            student_detection=detection,
+            document_id=document_id,
+            success=True,
+            status=status,
+            file_hash=file_hash,
+        )
 
-            # Move to appropriate folder
-            if move_files:
-                try:
-                    # Ensure destination folder exists
-                    dest_folder_path = self.dropbox.get_or_create_subfolder("", dest_folder)
+        # Commit (now or with the caller's batch), then move
+        pending = (result, dest_folder if move_files else None)
+        if uncommitted is None:
+            self._commit_saved([pending])
+        else:
+            uncommitted.append(pending)
+
+        return result
 
-                    # Build new path
-                    new_path = f"{dest_folder_path}/{dropbox_file.name}"
+    def _commit_saved(
+        self,
+        uncommitted: List[Tuple[DropboxProcessingResult, Optional[str]]],
+    ) -> None:
+        """
+        Commit saved documents in one transaction, then move their files.
 
-                    self.dropbox.move_file(dropbox_file.file_path, new_path)
-                    logger.info(f"Moved {dropbox_file.name} to {dest_folder} folder")
-                except Exception as e:
-                    logger.warning(f"Failed to move file: {e}")
+        If the commit fails, the batch is rolled back and its results are
+        marked failed; those files stay in place to be retried next run.
 
-            return DropboxProcessingResult(
-                dropbox_file=dropbox_file,
-                ocr_result=ocr_result,
-                parsed=parsed,
-                match=match,
-                student_detection=detection,
-                document_id=document_id,
-                success=True,
-                status=status,
-                file_hash=file_hash,
-            )
+        Args:
+            uncommitted: (result, destination folder or None) pairs; cleared
+                once handled
+        """
+        if not uncommitted:
+            return
+
+        try:
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Failed to commit {len(uncommitted)} documents: {e}")
+            for result, _ in uncommitted:
+                result.success = False
+                result.status = "failed"
+                result.document_id = None
+                result.error = str(e)
+            uncommitted.clear()
+            return
+
+        for result, dest_folder in uncommitted:
+            if dest_folder:
+                self._move_to_folder(result.dropbox_file, dest_folder)
+        uncommitted.clear()
+
+    def _move_to_folder(self, dropbox_file: DropboxFile, dest_folder: str) -> None:
+        """Move a processed file into a top-level folder (created if needed)."""
+        try:
+            # Ensure destination folder exists
+            dest_folder_path = self.dropbox.get_or_create_subfolder("", dest_folder)
 
+            # Build new path
+            new_path = f"{dest_folder_path}/{dropbox_file.name}"
+
+            self.dropbox.move_file(dropbox_file.file_path, new_path)
+            logger.info(f"Moved {dropbox_file.name} to {dest_folder} folder")
         except Exception as e:
-            logger.error(f"Failed to process {dropbox_file.name}: {e}")
-            return DropboxProcessingResult(
-                dropbox_file=dropbox_file,
-                ocr_result=None,
-                parsed=None,
-                match=None,
-                student_detection=None,
-                document_id=None,
-                success=False,
-                status="failed",
-                error=str(e),
-            )
+            logger.warning(f"Failed to move file: {e}")
 
     def _save_to_database_with_detection(
         self,
@@ -345,7 +556,11 @@ class DropboxProcessor:
         file_hash: Optional[str] = None,
         web_link: str = "",
     ) -> int:
-        """Save processed document to database with detection info."""
+        """
+        Add a processed document with detection info to the session.
+
+        The document is flushed to assign its ID but not committed.
+        """
         doc = ScannedDocument(
             student_id=student_id,
             assignment_id=match.assignment.id if match and match.assignment else None,
@@ -365,8 +580,9 @@ class DropboxProcessor:
             # Dropbox-specific fields
             dropbox_path=dropbox_file.file_path,
             dropbox_url=web_link,
-            # Hash for duplicate detection
+            # Hashes for duplicate detection
             file_hash=file_hash,
+            dropbox_content_hash=dropbox_file.content_hash or None,
             # Detection fields
             status=status,
             detection_confidence=detection.confidence,
@@ -379,8 +595,10 @@ class DropboxProcessor:
             if parsed.score and parsed.score.earned:
                 doc.score_discrepancy = parsed.score.earned - match.assignment.score
 
-        self.session.add(doc)
-        self.session.commit()
+        # Savepoint so a failed insert doesn't discard the rest of the batch
+        with self.session.begin_nested():
+            self.session.add(doc)
+            self.session.flush()
 
         return doc.id
 
@@ -399,26 +617,297 @@ class DropboxProcessor:
             move_files: Whether to move files after processing
 
         Returns:
-            List of DropboxProcessingResults
+            List of DropboxProcessingResults (in listing order)
         """
         results = []
 
+        # List the folder in the background while the per-run state loads;
+        # the session stays on this thread
+        _ = self.dropbox
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            listing = pool.submit(self.dropbox.list_files, folder_path)
+
+            # Fresh per-run detection state: students load once and each
+            # student's assignments load once, however many files there are
+            students = self.session.query(Student).all()
+
+            files = listing.result()
+
         # Get new files
-        new_files = self.get_new_files(folder_path)
+        new_files = self.get_new_files(folder_path, files=files)
         logger.info(f"Found {len(new_files)} new files to process")
+        if not new_files:
+            return results
 
-        # Process each file with detection
+        # Which of the listed files' content hashes are stored, in one query
+        known_content_hashes = self._stored_hashes(
+            ScannedDocument.dropbox_content_hash,
+            (f.content_hash for f in new_files if f.content_hash),
+        )
+
+        student_detector = StudentDetector(self.session, students=students)
+        matcher = AssignmentMatcher(self.session)
+
+        # Existing shared links, paged in once when the first file gets to
+        # be saved: duplicates and failed files never need a link, and they
+        # stay in the folder, so listing links up front would repeat on
+        # every poll
+        shared_links = functools.cache(self.dropbox.list_shared_links)
+
+        workers = min(get_config().dropbox.max_workers, len(new_files))
+        if workers > 1:
+            return self._process_pipelined(
+                new_files=new_files,
+                confidence_threshold=confidence_threshold,
+                move_files=move_files,
+                known_content_hashes=known_content_hashes,
+                student_detector=student_detector,
+                matcher=matcher,
+                workers=workers,
+                shared_links=shared_links,
+            )
+
+        # Process each file with detection, committing in batches (each
+        # download's file hash is checked in the database as it arrives)
+        uncommitted = []
         for dropbox_file in new_files:
             result = self.process_file_with_detection(
                 dropbox_file=dropbox_file,
                 source_folder=folder_path,
                 confidence_threshold=confidence_threshold,
                 move_files=move_files,
+                known_content_hashes=known_content_hashes,
+                student_detector=student_detector,
+                matcher=matcher,
+                uncommitted=uncommitted,
+                shared_links=shared_links,
             )
             results.append(result)
+            if len(uncommitted) >= COMMIT_BATCH_SIZE:
+                self._commit_saved(uncommitted)
 
+        self._commit_saved(uncommitted)
         return results
 
+    def _process_pipelined(
+        self,
+        new_files: List[DropboxFile],
+        confidence_threshold: int,
+        move_files: bool,
+        known_content_hashes: Set[str],
+        student_detector: StudentDetector,
+        matcher: AssignmentMatcher,
+        workers: int,
+        shared_links: Optional[Callable[[], Dict[str, str]]] = None,
+    ) -> List[DropboxProcessingResult]:
+        """
+        Process files through a download -> OCR -> save pipeline.
+
+        A downloader thread fetches and hashes files, `workers` threads run
+        OCR and parse the text, and the calling thread saves and moves each
+        file. Everything
+        that touches the database stays on the calling thread, so a single
+        session is used. The bounded queues cap how many downloaded files
+        wait in memory when OCR is the bottleneck.
+
+        Args:
+            new_files: Files to process
+            confidence_threshold: Minimum confidence for auto-assignment
+            move_files: Whether to move files after processing
+            known_content_hashes: Stored Dropbox content hashes of the files
+                (updated as files are saved); matching files are not
+                downloaded
+            student_detector: StudentDetector shared by all files in the run
+            matcher: AssignmentMatcher shared by all files in the run
+            workers: Number of OCR threads
+            shared_links: Returns existing shared links by lowercase path
+                (called from the save stage only)
+
+        Returns:
+            List of DropboxProcessingResults (in the order of new_files)
+        """
+        ocr_queue = queue.Queue(maxsize=2 * workers)
+        save_queue = queue.Queue(maxsize=2 * workers)
+
+        # Stored file hashes found so far: looked up in bulk for each batch
+        # the save stage takes, plus files saved in this run
+        known_hashes: Set[str] = set()
+
+        # Create the lazy clients before any thread can race to build them
+        _ = self.dropbox
+        _ = self.ocr
+
+        def download_stage():
+            # Content seen earlier in this run (the first copy may still be
+            # in OCR, so these aren't in the known sets yet)
+            run_hashes = set()
+            run_content_hashes = set()
+            try:
+                for index, dropbox_file in enumerate(new_files):
+                    logger.info(f"Processing Dropbox file with detection: {dropbox_file.name}")
+                    item = _PipelineItem(index=index, dropbox_file=dropbox_file)
+                    content_hash = dropbox_file.content_hash
+                    if content_hash and content_hash in run_content_hashes:
+                        item.repeat = True
+                    # Likely duplicate by content_hash: don't download, the
+                    # save stage confirms against the database
+                    elif content_hash not in known_content_hashes:
+                        try:
+                            item.file_content, item.file_hash = (
+                                self.dropbox.download_file_hashed(dropbox_file.file_path)
+                            )
+                        except Exception as e:
+                            logger.error(f"Failed to download {dropbox_file.name}: {e}")
+                            item.error = str(e)
+                        # A failed download has no hash, and is reported as
+                        # an error rather than a repeat of another failure
+                        if item.file_hash is not None:
+                            if item.file_hash in run_hashes:
+                                item.repeat = True
+                                item.file_content = None
+                            run_hashes.add(item.file_hash)
+                            run_content_hashes.add(content_hash)
+                    ocr_queue.put(item)
+            finally:
+                for _ in range(workers):
+                    ocr_queue.put(None)
+
+        def ocr_stage():
+            try:
+                while True:
+                    item = ocr_queue.get()
+                    if item is None:
+                        break
+
+                    # Known hashes are duplicates, so skip OCR and let the
+                    # save stage confirm against the database (it downloads
+                    # again in the rare case that it isn't one)
+                    if item.file_hash in known_hashes:
+                        item.file_content = None
+                    elif item.error is None and item.file_content is not None:
+                        try:
+                            self._ocr_and_parse(item)
+                        except Exception as e:
+                            logger.error(f"OCR failed for {item.dropbox_file.name}: {e}")
+                            item.error = str(e)
+                            item.file_content = None
+                    save_queue.put(item)
+            finally:
+                save_queue.put(None)
+
+        threads = [threading.Thread(target=download_stage, daemon=True)]
+        threads += [threading.Thread(target=ocr_stage, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        logger.info(f"Processing with {workers} OCR workers")
+
+        results: List[Optional[DropboxProcessingResult]] = [None] * len(new_files)
+
+        # Save stage runs on this thread, committing in batches
+        uncommitted = []
+
+        def save_stage(item: _PipelineItem) -> DropboxProcessingResult:
+            dropbox_file = item.dropbox_file
+            try:
+                if item.error is not None:
+                    return self._failed_result(dropbox_file, item.error)
+
+                # Skipped by the downloader on a known content_hash
+                if item.file_hash is None:
+                    duplicate = self._content_duplicate_result(dropbox_file)
+                    if duplicate:
+                        return duplicate
+                    item.file_content, item.file_hash = (
+                        self.dropbox.download_file_hashed(dropbox_file.file_path)
+                    )
+                    known_hashes.update(
+                        self._stored_hashes(ScannedDocument.file_hash, [item.file_hash])
+                    )
+
+                # Also catches repeats of a file saved earlier in this run
+                if item.file_hash in known_hashes:
+                    duplicate = self._duplicate_result(dropbox_file, item.file_hash)
+                    if duplicate:
+                        return duplicate
+
+                if item.ocr_result is None:
+                    if item.file_content is None:
+                        item.file_content, _ = self.dropbox.download_file_hashed(
+                            dropbox_file.file_path
+                        )
+                    self._ocr_and_parse(item)
+
+                return self._complete_file(
+                    dropbox_file=dropbox_file,
+                    file_hash=item.file_hash,
+                    ocr_result=item.ocr_result,
+                    confidence_threshold=confidence_threshold,
+                    move_files=move_files,
+                    known_hashes=known_hashes,
+                    student_detector=student_detector,
+                    matcher=matcher,
+                    known_content_hashes=known_content_hashes,
+                    uncommitted=uncommitted,
+                    parsed=item.parsed,
+                    shared_links=shared_links,
+                )
+            except Exception as e:
+                logger.error(f"Failed to process {dropbox_file.name}: {e}")
+                return self._failed_result(dropbox_file, str(e))
+
+        # Repeats wait until their first copy has been saved, so they
+        # resolve as duplicates instead of going through OCR again
+        repeats = []
+        finished = 0
+        while finished < workers:
+            # Take everything that's ready (at least one item), so the
+            # batch's file hashes are checked in the database in one query
+            batch = [save_queue.get()]
+            while len(batch) < COMMIT_BATCH_SIZE:
+                try:
+                    batch.append(save_queue.get_nowait())
+                except queue.Empty:
+                    break
+            finished += batch.count(None)
+            batch = [item for item in batch if item is not None]
+            known_hashes.update(self._stored_hashes(
+                ScannedDocument.file_hash,
+                (item.file_hash for item in batch if item.file_hash),
+            ))
+
+            for item in batch:
+                if item.repeat:
+                    repeats.append(item)
+                    continue
+
+                results[item.index] = save_stage(item)
+                if len(uncommitted) >= COMMIT_BATCH_SIZE:
+                    self._commit_saved(uncommitted)
+
+        for item in repeats:
+            results[item.index] = save_stage(item)
+
+        self._commit_saved(uncommitted)
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def _ocr_and_parse(self, item: _PipelineItem) -> None:
+        """
+        Run OCR and parse the text for a pipeline item, in place.
+
+        Parsing is pure CPU work with no database access, so it runs here on
+        the OCR workers rather than on the serial save thread. The file
+        content is released as soon as OCR has consumed it.
+        """
+        item.ocr_result = self._ocr_file(item.dropbox_file, item.file_content)
+        item.file_content = None
+        if item.ocr_result.success:
+            item.parsed = self._parser.parse(item.ocr_result.full_text)
+
     def get_pending_documents(self) -> List[ScannedDocument]:
         """Get all documents with pending status from Dropbox."""
         return self.session.query(ScannedDocument).filter(
@@ -6,13 +6,15 @@ Monitors Gmail inbox for emails with image attachments,
 processes them through OCR, and stores results in the database.
 """
 
-import os
 import base64
+import hashlib
 import logging
-import tempfile
-from datetime import datetime
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+from email.utils import parsedate_to_datetime
+from typing import Optional, List, Dict, Any, Set, Tuple
 from pathlib import Path
 
 from sqlalchemy.orm import Session
@@ -20,7 +22,7 @@ from sqlalchemy.orm import Session
 from google_services.auth import GoogleAuth
 from database.models import Student, ScannedDocument
 from database.connection import get_session
-from .ocr import MistralOCR, OCRResult
+from .ocr import MistralOCR, OCRResult, get_ocr
 from .parser import GradeParser, ParsedDocument
 from .matcher import AssignmentMatcher, MatchResult
 
@@ -39,18 +41,111 @@ SUPPORTED_MIME_TYPES = {
 # Gmail label for processed emails
 PROCESSED_LABEL = "Canvas-Processed"
 
+# Maximum number of calls Gmail accepts in one batch request
+GMAIL_BATCH_SIZE = 100
+
+# Maximum number of message IDs Gmail accepts in one batchModify call
+GMAIL_BATCH_MODIFY_SIZE = 1000
+
+# Partial response for message fetches: headers and the MIME part tree
+# without inline body data (HTML bodies, quoted replies). Parts nested
+# deeper than MESSAGE_PARTS_DEPTH come back whole so nothing is missed.
+MESSAGE_PARTS_DEPTH = 6
+
+
+def _message_fields(depth: int) -> str:
+    """Build the Gmail fields mask for MESSAGE_FIELDS."""
+    part_fields = "mimeType,filename,body(attachmentId,size)"
+    parts = "parts"
+    for _ in range(depth):
+        parts = f"parts({part_fields},{parts})"
+    return f"payload(headers,{part_fields},{parts})"
+
+
+MESSAGE_FIELDS = _message_fields(MESSAGE_PARTS_DEPTH)
+
+# Canonical RFC 2822 date as sent by most mail clients,
+# e.g. "Wed, 12 Jun 2024 15:43:02 -0700"
+_FAST_DATE_RE = re.compile(
+    r"(?:[A-Za-z]{3}, )?(\d{1,2}) ([A-Za-z]{3}) (\d{4}) "
+    r"(\d{2}):(\d{2}):(\d{2}) ([+-]\d{4})"
+)
+
+_MONTHS = {
+    name: number
+    for number, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun",
+         "jul", "aug", "sep", "oct", "nov", "dec"],
+        start=1,
+    )
+}
+
+# timezone objects by "+hhmm" offset, built on first use
+_TIMEZONES: Dict[str, timezone] = {}
+
+
+def _parse_date(date_str: str) -> datetime:
+    """
+    Parse an email Date header.
+
+    Canonical dates are parsed with a precompiled regex; anything else
+    falls back to email.utils.parsedate_to_datetime, with the same results.
+
+    Raises:
+        ValueError, TypeError: If the date cannot be parsed
+    """
+    match = _FAST_DATE_RE.fullmatch(date_str)
+    month = _MONTHS.get(match.group(2).lower()) if match else None
+
+    # "-0000" means no timezone information, which the slow path handles
+    if month is not None and match.group(7) != "-0000":
+        day, _, year, hour, minute, second, offset = match.groups()
+
+        tz = _TIMEZONES.get(offset)
+        if tz is None:
+            seconds = int(offset[1:3]) * 3600 + int(offset[3:]) * 60
+            tz = _TIMEZONES[offset] = timezone(
+                timedelta(seconds=-seconds if offset[0] == "-" else seconds)
+            )
+
+        try:
+            return datetime(
+                int(year), month, int(day), int(hour), int(minute), int(second), tzinfo=tz
+            )
+        except ValueError:
+            pass
+
+    return parsedate_to_datetime(date_str)
+
+
+# Default number of attachments OCR'd concurrently by process_inbox
+DEFAULT_MAX_WORKERS = 8
+
+# Attachments downloaded per OCR worker at a time by process_inbox
+DOWNLOAD_CHUNKS_PER_WORKER = 2
+
+# Background threads writing save_to_disk files in process_inbox
+FILE_WRITE_WORKERS = 4
+
 
 @dataclass
 class EmailAttachment:
-    """Represents an email attachment."""
+    """
+    Represents an email attachment.
+
+    data is None until the attachment is downloaded, and process_inbox
+    releases it again once the attachment has been processed.
+    """
     filename: str
     mime_type: str
     size: int
-    data: bytes
+    data: Optional[bytes]
     message_id: str
     subject: str
     sender: str
     received_date: datetime
+    attachment_id: str = ""
+    file_hash: Optional[str] = None  # SHA256 hash of data, set once downloaded
 
 
 @dataclass
@@ -63,6 +158,7 @@ class ProcessingResult:
     document_id: Optional[int]  # Database ID if saved
     success: bool
     error: Optional[str] = None
+    duplicate: bool = False  # Same file as an already-saved document
 
 
 class EmailProcessor:
@@ -83,6 +179,7 @@ class EmailProcessor:
         auth: Optional[GoogleAuth] = None,
         ocr: Optional[MistralOCR] = None,
         session: Optional[Session] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
     ):
         """
         Initialize the email processor.
@@ -91,25 +188,26 @@ class EmailProcessor:
             auth: GoogleAuth instance
             ocr: MistralOCR instance
             session: Database session
+            max_workers: Concurrent OCR requests when processing the inbox
         """
         self._auth = auth or GoogleAuth()
+        self.max_workers = max(1, max_workers)
         self._ocr = ocr
         self._session = session
-        self._gmail = None
+        self._matcher: Optional[AssignmentMatcher] = None
         self._parser = GradeParser()
+        self._processed_label_id: Optional[str] = None
 
     @property
     def gmail(self):
-        """Get Gmail API service."""
-        if self._gmail is None:
-            self._gmail = self._auth.get_service("gmail")
-        return self._gmail
+        """Get Gmail API service for the current thread."""
+        return self._auth.get_service("gmail")
 
     @property
     def ocr(self) -> MistralOCR:
         """Get OCR instance (lazy load)."""
         if self._ocr is None:
-            self._ocr = MistralOCR()
+            self._ocr = get_ocr()
         return self._ocr
 
     @property
@@ -119,6 +217,13 @@ class EmailProcessor:
             self._session = get_session()
         return self._session
 
+    @property
+    def matcher(self) -> AssignmentMatcher:
+        """Get assignment matcher (lazy load, shared across attachments)."""
+        if self._matcher is None or self._matcher.session is not self.session:
+            self._matcher = AssignmentMatcher(self.session)
+        return self._matcher
+
     def get_unread_with_attachments(
         self,
         query: str = "",
@@ -156,12 +261,17 @@ class EmailProcessor:
             logger.error(f"Failed to fetch emails: {e}")
             return []
 
-    def get_attachments(self, message_id: str) -> List[EmailAttachment]:
+    def get_attachments(
+        self,
+        message_id: str,
+        include_data: bool = True,
+    ) -> List[EmailAttachment]:
         """
         Get image/PDF attachments from a message.
 
         Args:
             message_id: Gmail message ID
+            include_data: Whether to download the attachment contents
 
         Returns:
             List of EmailAttachment objects
@@ -173,76 +283,227 @@ class EmailProcessor:
                 userId="me",
                 id=message_id,
                 format="full",
+                fields=MESSAGE_FIELDS,
             ).execute()
 
-            # Get message metadata
-            headers = {h["name"]: h["value"] for h in message["payload"].get("headers", [])}
-            subject = headers.get("Subject", "No Subject")
-            sender = headers.get("From", "Unknown")
-            date_str = headers.get("Date", "")
+            for attachment in self._message_attachments(message_id, message):
+                # Download attachment
+                if include_data:
+                    attachment.data = self._download(attachment)
+                attachments.append(attachment)
+
+        except Exception as e:
+            logger.error(f"Failed to get attachments from message {message_id}: {e}")
+
+        return attachments
+
+    def get_attachments_batch(
+        self,
+        message_ids: List[str],
+        include_data: bool = True,
+    ) -> Dict[str, List[EmailAttachment]]:
+        """
+        Get image/PDF attachments for several messages using batched API calls.
+
+        Messages are fetched in one round of Gmail batch requests and their
+        attachments in a second, instead of one call per message and per
+        attachment. Messages the batches could not fetch fall back to
+        get_attachments().
+
+        Args:
+            message_ids: Gmail message IDs
+            include_data: Whether to download the attachment contents
+
+        Returns:
+            Dict mapping message ID to its list of EmailAttachment objects
+        """
+        messages, _ = self._execute_batched([
+            (message_id, self.gmail.users().messages().get(
+                userId="me", id=message_id, format="full", fields=MESSAGE_FIELDS
+            ))
+            for message_id in message_ids
+        ])
+
+        results = {}
+        for message_id in message_ids:
+            message = messages.get(message_id)
+            if message is None:
+                results[message_id] = self.get_attachments(message_id, include_data)
+                continue
 
-            # Parse date
             try:
-                # Handle various date formats
-                from email.utils import parsedate_to_datetime
-                received_date = parsedate_to_datetime(date_str)
-            except (ValueError, TypeError):
-                received_date = datetime.now()
-
-            # Find attachments
-            parts = self._get_all_parts(message["payload"])
-
-            for part in parts:
-                mime_type = part.get("mimeType", "")
-                filename = part.get("filename", "")
-                body = part.get("body", {})
-                attachment_id = body.get("attachmentId")
-                size = body.get("size", 0)
-
-                # Check if it's a supported attachment
-                if not filename or not attachment_id:
-                    continue
+                results[message_id] = self._message_attachments(message_id, message)
+            except Exception as e:
+                logger.error(f"Failed to get attachments from message {message_id}: {e}")
+                results[message_id] = []
 
-                if mime_type not in SUPPORTED_MIME_TYPES:
-                    # Check file extension as fallback
-                    ext = Path(filename).suffix.lower()
-                    if ext not in [".png", ".jpg", ".jpeg", ".webp", ".gif", ".pdf"]:
-                        continue
+        if include_data:
+            self._download_batch([a for atts in results.values() for a in atts])
 
-                # Download attachment
-                attachment_data = self.gmail.users().messages().attachments().get(
+            # Drop attachments that could not be downloaded
+            for message_id, attachments in results.items():
+                results[message_id] = [a for a in attachments if a.data is not None]
+
+        return results
+
+    def _download(self, attachment: EmailAttachment) -> bytes:
+        """Download and decode a single attachment's contents."""
+        attachment_data = self.gmail.users().messages().attachments().get(
+            userId="me",
+            messageId=attachment.message_id,
+            id=attachment.attachment_id,
+        ).execute()
+
+        return base64.urlsafe_b64decode(attachment_data["data"])
+
+    def _download_batch(self, attachments: List[EmailAttachment]):
+        """
+        Download the contents of attachments using batched API calls.
+
+        Sets each attachment's data in place. Attachments the batches miss
+        are retried one at a time and left without data if that fails too.
+        """
+        missing = [a for a in attachments if a.data is None]
+        if not missing:
+            return
+
+        attachments_api = self.gmail.users().messages().attachments()
+        downloads, _ = self._execute_batched([
+            (
+                str(index),
+                attachments_api.get(
                     userId="me",
-                    messageId=message_id,
-                    id=attachment_id,
-                ).execute()
-
-                data = base64.urlsafe_b64decode(attachment_data["data"])
-
-                attachments.append(EmailAttachment(
-                    filename=filename,
-                    mime_type=mime_type,
-                    size=size,
-                    data=data,
-                    message_id=message_id,
-                    subject=subject,
-                    sender=sender,
-                    received_date=received_date,
-                ))
+                    messageId=attachment.message_id,
+                    id=attachment.attachment_id,
+                ),
+            )
+            for index, attachment in enumerate(missing)
+        ])
 
-        except Exception as e:
-            logger.error(f"Failed to get attachments from message {message_id}: {e}")
+        for index, attachment in enumerate(missing):
+            try:
+                attachment_data = downloads.pop(str(index), None)
+                if attachment_data is None:
+                    attachment.data = self._download(attachment)
+                else:
+                    attachment.data = base64.urlsafe_b64decode(attachment_data["data"])
+            except Exception as e:
+                logger.error(f"Failed to download attachment {attachment.filename}: {e}")
+
+    def _execute_batched(
+        self,
+        requests: List[Tuple[str, Any]],
+    ) -> Tuple[Dict[str, Any], Set[str]]:
+        """
+        Execute Gmail API requests in batches of GMAIL_BATCH_SIZE.
 
-        return attachments
+        Args:
+            requests: (request_id, HttpRequest) pairs
+
+        Returns:
+            Tuple of (responses keyed by request ID, IDs of failed requests)
+        """
+        responses = {}
+        failed = set()
+
+        def _on_response(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"Gmail batch request {request_id} failed: {exception}")
+                failed.add(request_id)
+            else:
+                responses[request_id] = response
+
+        for start in range(0, len(requests), GMAIL_BATCH_SIZE):
+            chunk = requests[start:start + GMAIL_BATCH_SIZE]
+            batch = self.gmail.new_batch_http_request(callback=_on_response)
+            for request_id, request in chunk:
+                batch.add(request, request_id=request_id)
+
+            try:
+                batch.execute()
+            except Exception as e:
+                logger.warning(f"Gmail batch request failed: {e}")
+                failed.update(
+                    request_id for request_id, _ in chunk
+                    if request_id not in responses
+                )
+
+        return responses, failed
+
+    def _message_info(self, message: Dict[str, Any]) -> Tuple[str, str, datetime]:
+        """Get (subject, sender, received date) from a full message."""
+        headers = {h["name"]: h["value"] for h in message["payload"].get("headers", [])}
+        subject = headers.get("Subject", "No Subject")
+        sender = headers.get("From", "Unknown")
+        date_str = headers.get("Date", "")
+
+        # Parse date
+        try:
+            # Handle various date formats
+            received_date = _parse_date(date_str)
+        except (ValueError, TypeError):
+            received_date = datetime.now()
+
+        return subject, sender, received_date
+
+    def _attachment_parts(self, message: Dict[str, Any]) -> List[Dict]:
+        """Get the supported image/PDF attachment parts of a full message."""
+        attachment_parts = []
+
+        for part in self._get_all_parts(message["payload"]):
+            mime_type = part.get("mimeType", "")
+            filename = part.get("filename", "")
+            attachment_id = part.get("body", {}).get("attachmentId")
+
+            # Check if it's a supported attachment
+            if not filename or not attachment_id:
+                continue
+
+            if mime_type not in SUPPORTED_MIME_TYPES:
+                # Check file extension as fallback
+                ext = Path(filename).suffix.lower()
+                if ext not in [".png", ".jpg", ".jpeg", ".webp", ".gif", ".pdf"]:
+                    continue
+
+            attachment_parts.append(part)
+
+        return attachment_parts
+
+    def _message_attachments(
+        self,
+        message_id: str,
+        message: Dict[str, Any],
+    ) -> List[EmailAttachment]:
+        """Build EmailAttachments (without data) from a full message."""
+        subject, sender, received_date = self._message_info(message)
+
+        return [
+            EmailAttachment(
+                filename=part["filename"],
+                mime_type=part.get("mimeType", ""),
+                size=part["body"].get("size", 0),
+                data=None,
+                message_id=message_id,
+                subject=subject,
+                sender=sender,
+                received_date=received_date,
+                attachment_id=part["body"]["attachmentId"],
+            )
+            for part in self._attachment_parts(message)
+        ]
 
     def _get_all_parts(self, payload: Dict) -> List[Dict]:
-        """Recursively get all parts from a message payload."""
+        """Get all leaf parts from a message payload, in document order."""
         parts = []
+        stack = [payload]
 
-        if "parts" in payload:
-            for part in payload["parts"]:
-                parts.extend(self._get_all_parts(part))
-        else:
-            parts.append(payload)
+        while stack:
+            part = stack.pop()
+            if "parts" in part:
+                # Reversed so the first subpart is popped first
+                stack.extend(reversed(part["parts"]))
+            else:
+                parts.append(part)
 
         return parts
 
@@ -263,88 +524,197 @@ class EmailProcessor:
         Returns:
             ProcessingResult with all extracted data
         """
-        logger.info(f"Processing attachment: {attachment.filename}")
-
         try:
-            # Run OCR
-            if attachment.mime_type.startswith("image/"):
-                ocr_result = self.ocr.process_image_bytes(
-                    attachment.data,
-                    attachment.filename,
-                    attachment.mime_type,
-                )
-            else:
-                # For PDFs, save to temp file first
-                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
-                    f.write(attachment.data)
-                    temp_path = f.name
-
-                try:
-                    ocr_result = self.ocr.process_file(temp_path)
-                finally:
-                    os.unlink(temp_path)
-
-            if not ocr_result.success:
-                return ProcessingResult(
-                    attachment=attachment,
-                    ocr_result=ocr_result,
-                    parsed=None,
-                    match=None,
-                    document_id=None,
-                    success=False,
-                    error=ocr_result.error,
-                )
-
-            # Parse OCR text
-            parsed = self._parser.parse(ocr_result.full_text)
+            if attachment.data is None:
+                attachment.data = self._download(attachment)
 
-            # Match to assignment
-            matcher = AssignmentMatcher(self.session)
-            match = matcher.find_match(parsed, student_id)
+            # Skip files that were already processed for this student
+            existing = self._known_hashes(student_id, [attachment])
+            if existing:
+                return self._duplicate_result(attachment, existing[attachment.file_hash])
 
-            # Save to database
-            document_id = self._save_to_database(
-                attachment=attachment,
-                ocr_result=ocr_result,
-                parsed=parsed,
-                match=match,
-                student_id=student_id,
+            ocr_result, parsed = self._ocr_attachment(attachment)
+            return self._complete_attachment(
+                attachment, ocr_result, parsed, student_id, save_to_disk
             )
 
-            # Optionally save files to disk
-            if save_to_disk:
-                self._save_files(save_to_disk, attachment, ocr_result)
+        except Exception as e:
+            return self._error_result(attachment, e)
 
-            return ProcessingResult(
-                attachment=attachment,
-                ocr_result=ocr_result,
-                parsed=parsed,
-                match=match,
-                document_id=document_id,
-                success=True,
+    def _ocr_attachment(
+        self,
+        attachment: EmailAttachment,
+    ) -> Tuple[OCRResult, Optional[ParsedDocument]]:
+        """
+        Run OCR and text parsing on an attachment.
+
+        Touches no database state, so it is safe to run on worker threads.
+
+        Returns:
+            Tuple of (OCR result, parsed document or None if OCR failed)
+        """
+        logger.info(f"Processing attachment: {attachment.filename}")
+
+        # Run OCR
+        if attachment.mime_type.startswith("image/"):
+            ocr_result = self.ocr.process_image_bytes(
+                attachment.data,
+                attachment.filename,
+                attachment.mime_type,
             )
+        else:
+            # PDFs are uploaded straight from memory
+            ocr_result = self.ocr.process_pdf_bytes(attachment.data, attachment.filename)
 
-        except Exception as e:
-            logger.error(f"Failed to process {attachment.filename}: {e}")
+        if not ocr_result.success:
+            return ocr_result, None
+
+        # Parse OCR text
+        return ocr_result, self._parser.parse(ocr_result.full_text)
+
+    def _complete_attachment(
+        self,
+        attachment: EmailAttachment,
+        ocr_result: OCRResult,
+        parsed: Optional[ParsedDocument],
+        student_id: int,
+        save_to_disk: Optional[str] = None,
+        pending: Optional[List[Tuple[ScannedDocument, ProcessingResult]]] = None,
+        writer: Optional[ThreadPoolExecutor] = None,
+    ) -> ProcessingResult:
+        """
+        Match an OCR'd attachment to an assignment and save it.
+
+        When a pending list is given, the document is queued on it for
+        _commit_pending() instead of being committed right away, and the
+        result's document_id is filled in at that point. When a writer
+        pool is given, files for save_to_disk are written on it.
+        """
+        if not ocr_result.success:
             return ProcessingResult(
                 attachment=attachment,
-                ocr_result=None,
+                ocr_result=ocr_result,
                 parsed=None,
                 match=None,
                 document_id=None,
                 success=False,
-                error=str(e),
+                error=ocr_result.error,
             )
 
-    def _save_to_database(
+        # Match to assignment
+        match = self.matcher.find_match(parsed, student_id)
+
+        # Save to database
+        doc = self._build_document(
+            attachment=attachment,
+            ocr_result=ocr_result,
+            parsed=parsed,
+            match=match,
+            student_id=student_id,
+        )
+        document_id = self._flush_documents([doc])[0] if pending is None else None
+
+        # Optionally save files to disk
+        if save_to_disk:
+            if writer is None:
+                self._save_files(save_to_disk, attachment.filename, attachment.data, ocr_result.full_text)
+            else:
+                writer.submit(
+                    self._save_files_logged,
+                    save_to_disk, attachment.filename, attachment.data, ocr_result.full_text,
+                )
+
+        result = ProcessingResult(
+            attachment=attachment,
+            ocr_result=ocr_result,
+            parsed=parsed,
+            match=match,
+            document_id=document_id,
+            success=True,
+        )
+        if pending is not None:
+            pending.append((doc, result))
+        return result
+
+    def _known_hashes(
+        self,
+        student_id: int,
+        attachments: List[EmailAttachment],
+    ) -> Dict[str, int]:
+        """
+        Hash downloaded attachments and look up already-saved copies.
+
+        Sets file_hash on each attachment that has data; attachments
+        without data are looked up by a file_hash set earlier, if any.
+
+        Args:
+            student_id: Student's database ID
+            attachments: Attachments to check
+
+        Returns:
+            Dict mapping file hash to existing document ID for the
+            attachments that were already processed for this student
+        """
+        hashes = set()
+        for attachment in attachments:
+            if attachment.data is not None:
+                attachment.file_hash = hashlib.sha256(attachment.data).hexdigest()
+            if attachment.file_hash:
+                hashes.add(attachment.file_hash)
+
+        if not hashes:
+            return {}
+
+        rows = self.session.query(ScannedDocument.file_hash, ScannedDocument.id).filter(
+            ScannedDocument.student_id == student_id,
+            ScannedDocument.file_hash.in_(hashes),
+        ).all()
+        return {file_hash: document_id for file_hash, document_id in rows}
+
+    def _duplicate_result(
+        self,
+        attachment: EmailAttachment,
+        document_id: int,
+    ) -> ProcessingResult:
+        """Build the result for an attachment that was already processed."""
+        logger.info(f"Duplicate detected: {attachment.filename} matches existing document ID {document_id}")
+        return ProcessingResult(
+            attachment=attachment,
+            ocr_result=None,
+            parsed=None,
+            match=None,
+            document_id=document_id,
+            success=True,
+            error=f"Duplicate of document ID {document_id}",
+            duplicate=True,
+        )
+
+    def _error_result(
+        self,
+        attachment: EmailAttachment,
+        error: Exception,
+    ) -> ProcessingResult:
+        """Build the result for an attachment that raised during processing."""
+        logger.error(f"Failed to process {attachment.filename}: {error}")
+        return ProcessingResult(
+            attachment=attachment,
+            ocr_result=None,
+            parsed=None,
+            match=None,
+            document_id=None,
+            success=False,
+            error=str(error),
+        )
+
+    def _build_document(
         self,
         attachment: EmailAttachment,
         ocr_result: OCRResult,
         parsed: ParsedDocument,
         match: MatchResult,
         student_id: int,
-    ) -> int:
-        """Save processed document to database."""
+    ) -> ScannedDocument:
+        """Build an unsaved ScannedDocument for a processed attachment."""
         doc = ScannedDocument(
             student_id=student_id,
             assignment_id=match.assignment.id if match.assignment else None,
@@ -354,6 +724,7 @@ class EmailProcessor:
             mime_type=attachment.mime_type,
             scan_date=attachment.received_date,
             source="email",
+            file_hash=attachment.file_hash,
             ocr_text=ocr_result.full_text,
             detected_title=parsed.title,
             detected_date=parsed.date,
@@ -369,66 +740,118 @@ class EmailProcessor:
             if parsed.score and parsed.score.earned:
                 doc.score_discrepancy = parsed.score.earned - match.assignment.score
 
-        self.session.add(doc)
+        return doc
+
+    def _flush_documents(self, docs: List[ScannedDocument]) -> List[int]:
+        """
+        Save documents to the database in a single commit.
+
+        Returns:
+            Database IDs of the documents, in order
+        """
+        self.session.add_all(docs)
+        self.session.flush()
+
+        # Read IDs before committing, which would expire the objects
+        document_ids = [doc.id for doc in docs]
         self.session.commit()
 
-        return doc.id
+        return document_ids
+
+    def _commit_pending(self, pending: List[Tuple[ScannedDocument, ProcessingResult]]):
+        """Commit queued documents and fill in their results' document IDs."""
+        if not pending:
+            return
+
+        try:
+            document_ids = self._flush_documents([doc for doc, _ in pending])
+        except Exception as e:
+            self.session.rollback()
+            logger.error(f"Failed to save {len(pending)} documents: {e}")
+            for _, result in pending:
+                result.success = False
+                result.error = str(e)
+            return
+
+        for (_, result), document_id in zip(pending, document_ids):
+            result.document_id = document_id
 
     def _save_files(
         self,
         output_dir: str,
-        attachment: EmailAttachment,
-        ocr_result: OCRResult,
+        filename: str,
+        data: bytes,
+        ocr_text: str,
     ):
         """Save attachment and OCR text to disk."""
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
         # Save original attachment
-        attachment_path = output_path / attachment.filename
-        with open(attachment_path, "wb") as f:
-            f.write(attachment.data)
+        (output_path / filename).write_bytes(data)
 
         # Save OCR text
-        text_path = output_path / f"{Path(attachment.filename).stem}_ocr.txt"
-        with open(text_path, "w") as f:
-            f.write(ocr_result.full_text)
+        (output_path / f"{Path(filename).stem}_ocr.txt").write_text(ocr_text)
+
+    def _save_files_logged(
+        self,
+        output_dir: str,
+        filename: str,
+        data: bytes,
+        ocr_text: str,
+    ):
+        """Save files from a background writer, logging any failure."""
+        try:
+            self._save_files(output_dir, filename, data, ocr_text)
+        except Exception as e:
+            logger.error(f"Failed to save {filename} to {output_dir}: {e}")
 
     def mark_as_processed(self, message_id: str):
         """Mark an email as processed by adding a label."""
+        self.mark_many_as_processed([message_id])
+
+    def mark_many_as_processed(self, message_ids: List[str]):
+        """Mark several emails as processed with batchModify calls."""
+        if not message_ids:
+            return
+
         try:
             # Create label if it doesn't exist
-            self._ensure_label_exists()
-
-            # Get label ID
-            labels = self.gmail.users().labels().list(userId="me").execute()
-            label_id = None
-            for label in labels.get("labels", []):
-                if label["name"] == PROCESSED_LABEL:
-                    label_id = label["id"]
-                    break
+            label_id = self._ensure_label_exists()
 
             if label_id:
-                # Add label to message
-                self.gmail.users().messages().modify(
-                    userId="me",
-                    id=message_id,
-                    body={"addLabelIds": [label_id]},
-                ).execute()
+                # Add label to messages
+                for start in range(0, len(message_ids), GMAIL_BATCH_MODIFY_SIZE):
+                    self.gmail.users().messages().batchModify(
+                        userId="me",
+                        body={
+                            "ids": message_ids[start:start + GMAIL_BATCH_MODIFY_SIZE],
+                            "addLabelIds": [label_id],
+                        },
+                    ).execute()
 
         except Exception as e:
-            logger.warning(f"Failed to mark message as processed: {e}")
+            logger.warning(f"Failed to mark messages as processed: {e}")
+
+    def _ensure_label_exists(self) -> Optional[str]:
+        """
+        Create the processed label if it doesn't exist.
+
+        Returns:
+            The label's ID (cached after the first lookup), or None on failure
+        """
+        if self._processed_label_id:
+            return self._processed_label_id
 
-    def _ensure_label_exists(self):
-        """Create the processed label if it doesn't exist."""
         try:
             labels = self.gmail.users().labels().list(userId="me").execute()
             for label in labels.get("labels", []):
                 if label["name"] == PROCESSED_LABEL:
-                    return  # Label exists
+                    self._processed_label_id = label["id"]
+                    return self._processed_label_id  # Label exists
 
             # Create label
-            self.gmail.users().labels().create(
+            label = self.gmail.users().labels().create(
                 userId="me",
                 body={
                     "name": PROCESSED_LABEL,
@@ -436,10 +859,13 @@ class EmailProcessor:
                     "messageListVisibility": "show",
                 },
             ).execute()
+            self._processed_label_id = label["id"]
 
         except Exception as e:
             logger.warning(f"Failed to create label: {e}")
 
+        return self._processed_label_id
+
     def process_inbox(
         self,
         student_id: int,
@@ -467,29 +893,103 @@ class EmailProcessor:
         messages = self.get_unread_with_attachments(query, max_emails)
         logger.info(f"Found {len(messages)} unread emails with attachments")
 
-        for msg in messages:
-            message_id = msg["id"]
-
-            # Get attachments
-            attachments = self.get_attachments(message_id)
-
-            if not attachments:
-                continue
-
-            # Process each attachment
-            message_results = []
-            for attachment in attachments:
-                result = self.process_attachment(
-                    attachment,
-                    student_id,
-                    save_to_disk,
-                )
-                message_results.append(result)
-                results.append(result)
-
-            # Mark message as processed if any attachment succeeded
-            if mark_processed and any(r.success for r in message_results):
-                self.mark_as_processed(message_id)
+        # Fetch all messages in batched API calls; attachment contents are
+        # downloaded a chunk at a time below to bound memory use
+        message_ids = [msg["id"] for msg in messages]
+        attachments_by_message = self.get_attachments_batch(message_ids, include_data=False)
+
+        work = [
+            (message_id, attachment)
+            for message_id in message_ids
+            for attachment in attachments_by_message.get(message_id, [])
+        ]
+        if not work:
+            return results
+
+        # OCR runs concurrently; matching and saving stay on this thread
+        # because the database session is not thread-safe
+        result_messages: List[str] = []
+        pending: List[Tuple[ScannedDocument, ProcessingResult]] = []
+        run_hashes: Set[str] = set()
+        repeats: List[Tuple[int, EmailAttachment]] = []
+        workers = min(self.max_workers, len(work))
+        chunk_size = workers * DOWNLOAD_CHUNKS_PER_WORKER
+
+        # Files for save_to_disk are written in the background, overlapping
+        # the next attachments' OCR; leaving the block waits for them
+        with ThreadPoolExecutor(max_workers=workers) as pool, \
+                ThreadPoolExecutor(max_workers=FILE_WRITE_WORKERS) as writer:
+            for start in range(0, len(work), chunk_size):
+                chunk = work[start:start + chunk_size]
+                self._download_batch([attachment for _, attachment in chunk])
+                existing = self._known_hashes(student_id, [attachment for _, attachment in chunk])
+
+                # Only OCR files not seen before, for this student or this run
+                futures = []
+                for _, attachment in chunk:
+                    future = None
+                    if (
+                        attachment.data is not None
+                        and attachment.file_hash not in existing
+                        and attachment.file_hash not in run_hashes
+                    ):
+                        run_hashes.add(attachment.file_hash)
+                        future = pool.submit(self._ocr_attachment, attachment)
+                    futures.append(future)
+
+                for (message_id, attachment), future in zip(chunk, futures):
+                    result_messages.append(message_id)
+
+                    try:
+                        if attachment.data is None:
+                            raise RuntimeError("Attachment could not be downloaded")
+
+                        if attachment.file_hash in existing:
+                            result = self._duplicate_result(
+                                attachment, existing[attachment.file_hash]
+                            )
+                        elif future is None:
+                            # Repeat of an earlier attachment in this run,
+                            # settled once that one has been saved
+                            repeats.append((len(results), attachment))
+                            result = None
+                        else:
+                            ocr_result, parsed = future.result()
+                            result = self._complete_attachment(
+                                attachment, ocr_result, parsed, student_id,
+                                save_to_disk, pending, writer,
+                            )
+                    except Exception as e:
+                        result = self._error_result(attachment, e)
+
+                    # The contents are no longer needed once saved
+                    attachment.data = None
+
+                    results.append(result)
+
+        # Save every document in one transaction
+        self._commit_pending(pending)
+
+        # Repeats now resolve to the saved copy (or get processed if it failed)
+        existing = self._known_hashes(student_id, [attachment for _, attachment in repeats])
+        for index, attachment in repeats:
+            if attachment.file_hash in existing:
+                results[index] = self._duplicate_result(attachment, existing[attachment.file_hash])
+            else:
+                results[index] = self.process_attachment(attachment, student_id, save_to_disk)
+                attachment.data = None
+
+        # Mark messages as processed if any attachment succeeded
+        if mark_processed:
+            succeeded = {
+                message_id
+                for message_id, result in zip(result_messages, results)
+                if result.success
+            }
+            self.mark_many_as_processed([
+                message_id for message_id in dict.fromkeys(result_messages)
+                if message_id in succeeded
+            ])
 
         return results
 
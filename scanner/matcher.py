@@ -6,19 +6,42 @@ Uses fuzzy matching on title, date proximity, and course name to find
 the best matching Canvas assignment for a scanned document.
 """
 
+import heapq
 import logging
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from dataclasses import dataclass
-from typing import Optional, List, Tuple
-from difflib import SequenceMatcher
+from typing import Optional, List, Tuple, Dict
 
-from sqlalchemy.orm import Session
+# CyDifflib is a compiled drop-in for difflib (same algorithm and results)
+try:
+    from cydifflib import SequenceMatcher
+except ImportError:
+    from difflib import SequenceMatcher
+
+import numpy as np
+from sqlalchemy.orm import Session, contains_eager
 
 from database.models import Assignment, Course, Student
 from .parser import ParsedDocument
 
 logger = logging.getLogger(__name__)
 
+MICROSECONDS_PER_DAY = 86_400_000_000
+
+# Signals recorded while scoring, used to name the match method
+TITLE_SIGNAL = 1
+DATE_SIGNAL = 2
+
+MATCH_METHODS = {
+    TITLE_SIGNAL | DATE_SIGNAL: "title+date",
+    TITLE_SIGNAL: "title",
+    DATE_SIGNAL: "date",
+    0: "auto",
+}
+
 
 @dataclass
 class MatchResult:
@@ -34,6 +57,16 @@ class MatchResult:
         return self.confidence >= 70
 
 
+@dataclass(slots=True)
+class _StudentAssignments:
+    """A student's dated assignments, indexed for candidate lookup."""
+    assignments: List[Assignment]  # Query order
+    due_micros: np.ndarray  # Due times as int64 microseconds, query order
+    names: List[Tuple[str, Optional[str]]]  # Lowercased (name, course name), query order
+    positions: List[int]  # Indexes into assignments, sorted by due date
+    due_dates: List[datetime]  # Due dates in the same sorted order
+
+
 class AssignmentMatcher:
     """
     Matches scanned documents to Canvas assignments.
@@ -43,8 +76,14 @@ class AssignmentMatcher:
     2. Date proximity (within N days of due date)
     3. Course name matching
     4. Combined scoring
+
+    A single matcher can be shared across a processing run: each student's
+    assignments are loaded once and reused for every document.
     """
 
+    # SequenceMatchers kept per thread (most recently used names)
+    SEQUENCE_MATCHER_CACHE_SIZE = 1024
+
     def __init__(
         self,
         session: Session,
@@ -69,6 +108,14 @@ class AssignmentMatcher:
         self.course_weight = course_weight
         self.date_tolerance_days = date_tolerance_days
 
+        # Assignments per student, loaded on first use
+        self._cache: Dict[int, _StudentAssignments] = {}
+        self._cache_lock = threading.Lock()
+
+        # Per-thread SequenceMatchers keyed by the string they index,
+        # oldest first
+        self._local = threading.local()
+
     def find_match(
         self,
         parsed: ParsedDocument,
@@ -87,7 +134,7 @@ class AssignmentMatcher:
             MatchResult with best match and confidence
         """
         # Get candidate assignments
-        candidates = self._get_candidates(student_id, course_id, parsed.date)
+        candidates, names, due_micros = self._get_candidates(student_id, course_id, parsed.date)
 
         if not candidates:
             return MatchResult(
@@ -98,18 +145,15 @@ class AssignmentMatcher:
             )
 
         # Score each candidate
-        scored = []
-        for assignment in candidates:
-            score, reasons = self._score_match(parsed, assignment)
-            scored.append((assignment, score, reasons))
+        scored = self._score_candidates(parsed, candidates, names, due_micros, keep=1)
 
-        # Sort by score descending
-        scored.sort(key=lambda x: x[1], reverse=True)
+        # Sort by score descending (ties: earliest due, then lowest ID)
+        scored.sort(key=lambda x: (-x[1], x[0].due_at, x[0].id))
 
-        best_assignment, best_score, best_reasons = scored[0]
+        best_assignment, best_score, best_reasons, best_signals = scored[0]
 
         # Determine match method
-        method = self._determine_method(best_reasons)
+        method = self._determine_method(best_signals)
 
         return MatchResult(
             assignment=best_assignment,
@@ -137,12 +181,13 @@ class AssignmentMatcher:
         Returns:
             List of MatchResults sorted by confidence
         """
-        candidates = self._get_candidates(student_id, course_id, parsed.date)
+        candidates, names, due_micros = self._get_candidates(student_id, course_id, parsed.date)
 
         results = []
-        for assignment in candidates:
-            score, reasons = self._score_match(parsed, assignment)
-            method = self._determine_method(reasons)
+        for assignment, score, reasons, signals in self._score_candidates(
+            parsed, candidates, names, due_micros, keep=limit
+        ):
+            method = self._determine_method(signals)
             results.append(MatchResult(
                 assignment=assignment,
                 confidence=score,
@@ -150,110 +195,327 @@ class AssignmentMatcher:
                 reasons=reasons
             ))
 
-        # Sort by confidence and limit
-        results.sort(key=lambda r: r.confidence, reverse=True)
+        # Sort by confidence (ties as in find_match) and limit
+        results.sort(key=lambda r: (-r.confidence, r.assignment.due_at, r.assignment.id))
         return results[:limit]
 
+    def _get_assignments(self, student_id: int) -> _StudentAssignments:
+        """
+        Get all of a student's assignments that have a due date (cached).
+
+        Args:
+            student_id: Student's database ID
+
+        Returns:
+            _StudentAssignments index of the student's assignments
+        """
+        with self._cache_lock:
+            entry = self._cache.get(student_id)
+            if entry is None:
+                # Courses are read when scoring, so populate them from the
+                # join the query already makes
+                assignments = (
+                    self.session.query(Assignment)
+                    .join(Assignment.course)
+                    .filter(Course.student_id == student_id)
+                    .filter(Assignment.due_at.isnot(None))
+                    .options(contains_eager(Assignment.course))
+                    .all()
+                )
+                positions = sorted(range(len(assignments)), key=lambda i: assignments[i].due_at)
+                entry = _StudentAssignments(
+                    assignments=assignments,
+                    due_micros=np.array(
+                        [a.due_at for a in assignments], dtype="datetime64[us]"
+                    ).astype(np.int64),
+                    names=[
+                        (a.name.lower(), a.course.name.lower() if a.course else None)
+                        for a in assignments
+                    ],
+                    positions=positions,
+                    due_dates=[assignments[i].due_at for i in positions],
+                )
+                self._cache[student_id] = entry
+            return entry
+
     def _get_candidates(
         self,
         student_id: int,
         course_id: Optional[int],
         date: Optional[datetime],
-    ) -> List[Assignment]:
-        """Get candidate assignments for matching."""
-        # Start with base query
-        query = (
-            self.session.query(Assignment)
-            .join(Course)
-            .filter(Course.student_id == student_id)
-        )
+    ) -> Tuple[List[Assignment], List[Tuple[str, Optional[str]]], np.ndarray]:
+        """
+        Get candidate assignments for matching.
 
-        # Filter by course if specified
-        if course_id:
-            query = query.filter(Course.id == course_id)
+        Returns:
+            Tuple of (candidate assignments, their lowercased (name, course
+            name), their due times as int64 microseconds)
+        """
+        entry = self._get_assignments(student_id)
 
-        # Filter by date range if available
+        # Binary search the due date window
         if date:
             start_date = date - timedelta(days=self.date_tolerance_days * 2)
             end_date = date + timedelta(days=self.date_tolerance_days * 2)
-            query = query.filter(
-                Assignment.due_at.between(start_date, end_date)
-            )
+            window = entry.positions[
+                bisect_left(entry.due_dates, start_date):bisect_right(entry.due_dates, end_date)
+            ]
         else:
             # If no date, look at recent assignments (last 30 days)
             cutoff = datetime.now() - timedelta(days=30)
-            query = query.filter(Assignment.due_at >= cutoff)
+            window = entry.positions[bisect_left(entry.due_dates, cutoff):]
+
+        # Filter by course if specified
+        if course_id:
+            window = [i for i in window if entry.assignments[i].course_id == course_id]
+
+        return (
+            [entry.assignments[i] for i in window],
+            [entry.names[i] for i in window],
+            entry.due_micros[np.array(window, dtype=np.intp)],
+        )
+
+    def _score_dates(
+        self,
+        date: datetime,
+        due_micros: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score date proximity for all candidates at once.
+
+        Args:
+            date: Parsed document date
+            due_micros: Candidate due times as int64 microseconds
+
+        Returns:
+            Tuple of (whole days between date and each due date, date scores)
+        """
+        date_micros = np.datetime64(date, "us").astype(np.int64)
+
+        # Floor division matches timedelta.days
+        days = np.abs((date_micros - due_micros) // MICROSECONDS_PER_DAY)
+
+        tolerance = self.date_tolerance_days
+        scores = np.where(
+            days == 0,
+            100.0,
+            np.where(days <= tolerance, 100 * (1 - days / (tolerance + 1)), 0.0),
+        )
+        return days, scores
+
+    def _aggregate_scores(
+        self,
+        title_scores: np.ndarray,
+        date_scores: np.ndarray,
+        course_scores: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Combine per-signal scores into weighted totals for all candidates.
+
+        Returns:
+            Tuple of (total scores 0-100, whether each got the
+            multiple-strong-signals bonus)
+        """
+        totals = (
+            title_scores * self.title_weight +
+            date_scores * self.date_weight +
+            course_scores * self.course_weight
+        )
 
-        return query.all()
+        # Bonus for multiple strong signals
+        strong_signals = (
+            (title_scores > 70).astype(np.int8) +
+            (date_scores > 70) +
+            (course_scores > 70)
+        )
+        bonus = strong_signals >= 2
+        totals = np.where(bonus, np.minimum(totals + 10, 100.0), totals)
+
+        return totals, bonus
+
+    def _lower_fields(self, parsed: ParsedDocument) -> Tuple[Optional[str], Optional[str]]:
+        """Lowercase a parsed document's title and course name once per match."""
+        return (
+            parsed.title.lower() if parsed.title else None,
+            parsed.course_name.lower() if parsed.course_name else None,
+        )
 
-    def _score_match(
+    def _score_candidates(
         self,
         parsed: ParsedDocument,
-        assignment: Assignment,
-    ) -> Tuple[float, List[str]]:
+        candidates: List[Assignment],
+        names: List[Tuple[str, Optional[str]]],
+        due_micros: np.ndarray,
+        keep: Optional[int] = None,
+    ) -> List[Tuple[Assignment, float, List[str], int]]:
         """
-        Calculate match score between parsed document and assignment.
+        Calculate match scores between a parsed document and candidates.
+
+        Args:
+            parsed: Parsed document information
+            candidates: Candidate assignments
+            names: Candidates' lowercased (name, course name)
+            due_micros: Candidate due times as int64 microseconds
+            keep: If set, only the top `keep` scores are needed, and
+                candidates that provably cannot reach them may be left out
 
         Returns:
-            Tuple of (score 0-100, list of reasons)
+            List of (assignment, score 0-100, list of reasons, signal
+            flags), in candidate order
         """
-        reasons = []
-        scores = {
-            "title": 0.0,
-            "date": 0.0,
-            "course": 0.0,
-        }
+        title, course_name = self._lower_fields(parsed)
+        count = len(candidates)
+
+        # Date proximity for every candidate in one pass
+        if parsed.date:
+            days_diffs, date_scores = self._score_dates(parsed.date, due_micros)
+            days_diffs = days_diffs.tolist()
+        else:
+            date_scores = np.zeros(count)
+
+        # Course name match, once per distinct course
+        course_scores = np.zeros(count)
+        course_sims: Dict[int, float] = {}
+        if course_name:
+            by_course: Dict[str, float] = {}
+            for i, (_, assignment_course) in enumerate(names):
+                if assignment_course is None:
+                    continue
+                course_sim = by_course.get(assignment_course)
+                if course_sim is None:
+                    course_sim = self._string_similarity(course_name, assignment_course)
+                    by_course[assignment_course] = course_sim
+                course_sims[i] = course_sim
+                course_scores[i] = course_sim * 100
 
         # Title similarity
-        if parsed.title:
-            title_sim = self._string_similarity(
-                parsed.title.lower(),
-                assignment.name.lower()
-            )
-            scores["title"] = title_sim * 100
-
-            if title_sim > 0.8:
-                reasons.append(f"Title match: {title_sim:.0%} similar")
-            elif title_sim > 0.5:
-                reasons.append(f"Partial title match: {title_sim:.0%} similar")
-
-        # Date proximity
-        if parsed.date and assignment.due_at:
-            days_diff = abs((parsed.date - assignment.due_at).days)
-
-            if days_diff == 0:
-                scores["date"] = 100
-                reasons.append("Exact date match")
-            elif days_diff <= self.date_tolerance_days:
-                # Linear decay within tolerance
-                scores["date"] = 100 * (1 - days_diff / (self.date_tolerance_days + 1))
-                reasons.append(f"Date within {days_diff} days")
-
-        # Course name match
-        if parsed.course_name and assignment.course:
-            course_sim = self._string_similarity(
-                parsed.course_name.lower(),
-                assignment.course.name.lower()
+        if title:
+            title_scores, title_sims = self._score_titles(
+                title, names, date_scores, course_scores, keep
             )
-            scores["course"] = course_sim * 100
+            scored_indexes = sorted(title_sims)
+        else:
+            title_scores, title_sims = np.zeros(count), {}
+            scored_indexes = range(count)
+
+        # Weighted totals for every candidate in one pass
+        totals, bonus = self._aggregate_scores(title_scores, date_scores, course_scores)
+        totals = totals.tolist()
+        bonus = bonus.tolist()
 
-            if course_sim > 0.7:
+        scored = []
+        for i in scored_indexes:
+            assignment = candidates[i]
+            reasons = []
+            signals = 0
+
+            title_sim = title_sims.get(i)
+            if title_sim is not None:
+                if title_sim > 0.8:
+                    reasons.append(f"Title match: {title_sim:.0%} similar")
+                    signals |= TITLE_SIGNAL
+                elif title_sim > 0.5:
+                    reasons.append(f"Partial title match: {title_sim:.0%} similar")
+                    signals |= TITLE_SIGNAL
+
+            if parsed.date:
+                days_diff = days_diffs[i]
+                if days_diff == 0:
+                    reasons.append("Exact date match")
+                    signals |= DATE_SIGNAL
+                elif days_diff <= self.date_tolerance_days:
+                    reasons.append(f"Date within {days_diff} days")
+                    signals |= DATE_SIGNAL
+
+            course_sim = course_sims.get(i)
+            if course_sim is not None and course_sim > 0.7:
                 reasons.append(f"Course name match: {assignment.course.name}")
 
-        # Calculate weighted total
-        total = (
-            scores["title"] * self.title_weight +
-            scores["date"] * self.date_weight +
-            scores["course"] * self.course_weight
-        )
+            if bonus[i]:
+                reasons.append("Multiple strong matches")
 
-        # Bonus for multiple strong signals
-        strong_signals = sum(1 for s in scores.values() if s > 70)
-        if strong_signals >= 2:
-            total = min(total + 10, 100)
-            reasons.append("Multiple strong matches")
+            scored.append((assignment, totals[i], reasons, signals))
 
-        return total, reasons
+        return scored
+
+    def _score_titles(
+        self,
+        title: str,
+        names: List[Tuple[str, Optional[str]]],
+        date_scores: np.ndarray,
+        course_scores: np.ndarray,
+        keep: Optional[int],
+    ) -> Tuple[np.ndarray, Dict[int, float]]:
+        """
+        Compute title similarities, skipping candidates that cannot rank.
+
+        When only the top `keep` candidates are needed, every title
+        similarity is first bounded with SequenceMatcher.quick_ratio().
+        Candidates are then scored in order of their best possible total,
+        stopping once no remaining bound can reach the current top `keep`
+        totals, so skipped candidates could never have been returned.
+
+        Returns:
+            Tuple of (title scores 0-100, title similarity for each scored
+            candidate index)
+        """
+        count = len(names)
+        title_scores = np.zeros(count)
+        title_sims: Dict[int, float] = {}
+
+        if keep is None or keep < 1 or count <= keep:
+            order = range(count)
+            bound_totals = None
+        else:
+            bounds = np.array([
+                self._similarity_bound(title, name)
+                for name, _ in names
+            ]) * 100
+            bound_totals, _ = self._aggregate_scores(bounds, date_scores, course_scores)
+            order = np.argsort(-bound_totals, kind="stable").tolist()
+
+        top: List[float] = []  # Min-heap of the best `keep` totals so far
+        for i in order:
+            if bound_totals is not None and len(top) == keep and bound_totals[i] < top[0]:
+                break
+
+            title_sim = self._string_similarity(title, names[i][0])
+            title_sims[i] = title_sim
+            title_scores[i] = title_sim * 100
+
+            if bound_totals is not None:
+                total, _ = self._aggregate_scores(
+                    title_scores[i:i + 1], date_scores[i:i + 1], course_scores[i:i + 1]
+                )
+                if len(top) < keep:
+                    heapq.heappush(top, total[0])
+                else:
+                    heapq.heappushpop(top, total[0])
+
+        return title_scores, title_sims
+
+    def _sequence_matcher(self, a: str, b: str) -> SequenceMatcher:
+        """
+        Get a SequenceMatcher comparing a to b.
+
+        SequenceMatcher indexes its second string, which here is an
+        assignment or course name compared against every document, so one
+        matcher per name is kept and only the first string is swapped in.
+        """
+        matchers = getattr(self._local, "matchers", None)
+        if matchers is None:
+            matchers = self._local.matchers = OrderedDict()
+
+        matcher = matchers.get(b)
+        if matcher is None:
+            matcher = matchers[b] = SequenceMatcher(None, "", b)
+            if len(matchers) > self.SEQUENCE_MATCHER_CACHE_SIZE:
+                matchers.popitem(last=False)
+        else:
+            matchers.move_to_end(b)
+
+        matcher.set_seq1(a)
+        return matcher
 
     def _string_similarity(self, a: str, b: str) -> float:
         """
@@ -262,21 +524,20 @@ class AssignmentMatcher:
         Returns:
             Similarity ratio (0-1)
         """
-        return SequenceMatcher(None, a, b).ratio()
-
-    def _determine_method(self, reasons: List[str]) -> str:
-        """Determine the primary matching method from reasons."""
-        has_title = any("title" in r.lower() for r in reasons)
-        has_date = any("date" in r.lower() for r in reasons)
-
-        if has_title and has_date:
-            return "title+date"
-        elif has_title:
-            return "title"
-        elif has_date:
-            return "date"
-        else:
-            return "auto"
+        return self._sequence_matcher(a, b).ratio()
+
+    def _similarity_bound(self, a: str, b: str) -> float:
+        """
+        Cheap upper bound on _string_similarity(a, b).
+
+        Returns:
+            SequenceMatcher.quick_ratio() (0-1), never below the ratio
+        """
+        return self._sequence_matcher(a, b).quick_ratio()
+
+    def _determine_method(self, signals: int) -> str:
+        """Determine the primary matching method from scoring signal flags."""
+        return MATCH_METHODS[signals]
 
 
 def match_document_to_assignment(
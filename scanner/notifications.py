@@ -9,8 +9,12 @@ import logging
 import hashlib
 import hmac
 import base64
-from datetime import datetime
-from typing import Optional, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import lru_cache, partial
+from itertools import islice
+from typing import Optional, List, Tuple
 
 from config import get_config
 from database.models import Student, ScannedDocument
@@ -22,6 +26,73 @@ logger = logging.getLogger(__name__)
 # Secret key for signing tokens (should be in .env in production)
 TOKEN_SECRET = "canvas-parent-cli-secret-key"
 
+# Token layout: 4-byte document ID + 32-byte HMAC-SHA256, unpadded base64url
+TOKEN_ID_BYTES = 4
+TOKEN_LENGTH = 48
+
+# Pending documents loaded per round-trip by send_pending_notifications
+PENDING_BATCH_SIZE = 100
+
+# Concurrent Gmail sends in send_pending_notifications
+NOTIFICATION_WORKERS = 8
+
+# Shared Gmail client, so credentials are loaded once per process
+_gmail: Optional[GmailService] = None
+_gmail_lock = threading.Lock()
+
+# Inline style for the per-student assign buttons
+_BUTTON_STYLE = (
+    "display:inline-block;padding:10px 20px;background:#4CAF50;color:white;"
+    "text-decoration:none;border-radius:5px;margin:5px;"
+)
+
+# Static part of the notification HTML, shared by every email
+_EMAIL_HTML_HEAD = """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: #f5f5f5; padding: 15px; border-radius: 5px; margin-bottom: 20px; }
+        .preview { background: #fafafa; padding: 15px; border-left: 3px solid #ddd; margin: 15px 0; font-family: monospace; white-space: pre-wrap; }
+        .detected { background: #e8f5e9; padding: 15px; border-radius: 5px; margin: 15px 0; }
+        .buttons { margin: 20px 0; text-align: center; }
+        .footer { font-size: 12px; color: #666; margin-top: 30px; border-top: 1px solid #eee; padding-top: 15px; }
+    </style>
+</head>
+"""
+
+
+def _hmac_pads(secret: bytes):
+    """
+    Hash the HMAC-SHA256 inner and outer key pads (RFC 2104) once.
+
+    Returns:
+        Tuple of (inner, outer) sha256 objects to copy() per signature
+    """
+    block_size = hashlib.sha256().block_size
+    if len(secret) > block_size:
+        secret = hashlib.sha256(secret).digest()
+    key = secret.ljust(block_size, b"\0")
+
+    inner = hashlib.sha256(bytes(b ^ 0x36 for b in key))
+    outer = hashlib.sha256(bytes(b ^ 0x5C for b in key))
+    return inner, outer
+
+
+# The secret is fixed, so its key pads are hashed once at import
+_INNER_PAD, _OUTER_PAD = _hmac_pads(TOKEN_SECRET.encode())
+
+
+def _sign(message: str) -> bytes:
+    """HMAC-SHA256 a token message, continuing from the precomputed pads."""
+    inner = _INNER_PAD.copy()
+    inner.update(message.encode())
+    outer = _OUTER_PAD.copy()
+    outer.update(inner.digest())
+    return outer.digest()
+
 
 def generate_assign_token(document_id: int) -> str:
     """
@@ -33,16 +104,30 @@ def generate_assign_token(document_id: int) -> str:
     Returns:
         URL-safe base64 encoded signed token
     """
-    message = f"assign:{document_id}:{datetime.now().date().isoformat()}"
-    signature = hmac.new(
-        TOKEN_SECRET.encode(),
-        message.encode(),
-        hashlib.sha256
-    ).digest()
-    token = base64.urlsafe_b64encode(
-        f"{document_id}:{base64.urlsafe_b64encode(signature).decode()}".encode()
-    ).decode()
-    return token
+    message = f"assign:{document_id}:{date.today().isoformat()}"
+    signature = _sign(message)
+    payload = document_id.to_bytes(TOKEN_ID_BYTES, "big") + signature
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode()
+
+
+def _decode_token(token: str) -> Tuple[int, bytes]:
+    """
+    Split a token into its document ID and raw signature.
+
+    Tokens are unpadded base64url of a 4-byte big-endian document ID
+    followed by the 32-byte signature. Longer tokens use the older
+    base64("id:base64(signature)") form, still accepted so links already
+    sent out keep working until they expire.
+
+    Returns:
+        Tuple of (document_id, signature bytes)
+    """
+    raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    if len(token) == TOKEN_LENGTH:
+        return int.from_bytes(raw[:TOKEN_ID_BYTES], "big"), raw[TOKEN_ID_BYTES:]
+
+    doc_id_str, sig_b64 = raw.decode().split(":", 1)
+    return int(doc_id_str), base64.urlsafe_b64decode(sig_b64)
 
 
 def verify_assign_token(token: str) -> Optional[int]:
@@ -56,28 +141,40 @@ def verify_assign_token(token: str) -> Optional[int]:
         Document ID if valid, None otherwise
     """
     try:
-        decoded = base64.urlsafe_b64decode(token.encode()).decode()
-        doc_id_str, sig_b64 = decoded.split(":", 1)
-        doc_id = int(doc_id_str)
-
-        # Verify signature (check today and yesterday for timezone issues)
-        for date_offset in [0, -1]:
-            from datetime import timedelta
-            check_date = (datetime.now() + timedelta(days=date_offset)).date()
-            message = f"assign:{doc_id}:{check_date.isoformat()}"
-            expected_sig = hmac.new(
-                TOKEN_SECRET.encode(),
-                message.encode(),
-                hashlib.sha256
-            ).digest()
-            if base64.urlsafe_b64encode(expected_sig).decode() == sig_b64:
-                return doc_id
-
-        return None
+        doc_id, signature = _decode_token(token)
     except Exception as e:
         logger.error(f"Token verification failed: {e}")
         return None
 
+    # Verify signature (check today and yesterday for timezone issues)
+    today = date.today()
+    for check_date in (today, today - timedelta(days=1)):
+        if _signature_valid(doc_id, signature, check_date.isoformat()):
+            return doc_id
+
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _signature_valid(doc_id: int, signature: bytes, date_iso: str) -> bool:
+    """
+    Check a token's signature against one day's (cached).
+
+    Mail link scanners and refreshes hit the same token repeatedly, and the
+    outcome for a given token and day never changes, so results are
+    memoized; keying on the date lets old entries age out.
+
+    Args:
+        doc_id: Document ID from the token
+        signature: Signature bytes from the token
+        date_iso: Date the token may have been signed on (YYYY-MM-DD)
+
+    Returns:
+        True if the signature is valid for that date
+    """
+    expected_sig = _sign(f"assign:{doc_id}:{date_iso}")
+    return hmac.compare_digest(expected_sig, signature)
+
 
 def build_assignment_email(
     document: ScannedDocument,
@@ -100,9 +197,10 @@ def build_assignment_email(
     # Build preview from OCR text
     preview_text = ""
     if document.ocr_text:
-        lines = document.ocr_text.strip().split("\n")[:10]
-        preview_text = "\n".join(lines)
-        if len(document.ocr_text.split("\n")) > 10:
+        # Split off at most 11 lines: 10 to show, plus whether there's more
+        lines = document.ocr_text.strip().split("\n", 10)
+        preview_text = "\n".join(lines[:10])
+        if len(lines) > 10:
             preview_text += "\n..."
 
     # Build detected info section
@@ -119,19 +217,24 @@ def build_assignment_email(
 
     detected_section = "\n".join(f"  • {info}" for info in detected_info) if detected_info else "  No information detected"
 
+    scanned = document.scan_date.strftime('%Y-%m-%d %H:%M') if document.scan_date else 'Unknown'
+
     # Build assignment links
-    links_html = []
-    links_text = []
-    for student in students:
-        url = f"{base_url}/assign/{token}/{student.id}"
-        links_html.append(f'<a href="{url}" style="display:inline-block;padding:10px 20px;background:#4CAF50;color:white;text-decoration:none;border-radius:5px;margin:5px;">Assign to {student.name}</a>')
-        links_text.append(f"  → Assign to {student.name}: {url}")
+    assign_url = f"{base_url}/assign/{token}"
+    links_html = " ".join(
+        f'<a href="{assign_url}/{student.id}" style="{_BUTTON_STYLE}">Assign to {student.name}</a>'
+        for student in students
+    )
+    links_text = "\n".join(
+        f"  → Assign to {student.name}: {assign_url}/{student.id}"
+        for student in students
+    )
 
     # Plain text version
     text_content = f"""A scanned document couldn't be automatically assigned to a student.
 
 File: {document.file_name}
-Scanned: {document.scan_date.strftime('%Y-%m-%d %H:%M') if document.scan_date else 'Unknown'}
+Scanned: {scanned}
 
 Detected Information:
 {detected_section}
@@ -140,27 +243,13 @@ Preview:
 {preview_text if preview_text else '  [No text extracted]'}
 
 Please click to assign:
-{chr(10).join(links_text)}
+{links_text}
 
 Or reply to this email with the student's name.
 """
 
     # HTML version
-    html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-        .header {{ background: #f5f5f5; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
-        .preview {{ background: #fafafa; padding: 15px; border-left: 3px solid #ddd; margin: 15px 0; font-family: monospace; white-space: pre-wrap; }}
-        .detected {{ background: #e8f5e9; padding: 15px; border-radius: 5px; margin: 15px 0; }}
-        .buttons {{ margin: 20px 0; text-align: center; }}
-        .footer {{ font-size: 12px; color: #666; margin-top: 30px; border-top: 1px solid #eee; padding-top: 15px; }}
-    </style>
-</head>
-<body>
+    html_content = f"""{_EMAIL_HTML_HEAD}<body>
     <div class="container">
         <div class="header">
             <h2 style="margin:0;color:#333;">📄 Homework Scan Needs Assignment</h2>
@@ -168,7 +257,7 @@ Or reply to this email with the student's name.
         </div>
 
         <p><strong>File:</strong> {document.file_name}<br>
-        <strong>Scanned:</strong> {document.scan_date.strftime('%Y-%m-%d %H:%M') if document.scan_date else 'Unknown'}</p>
+        <strong>Scanned:</strong> {scanned}</p>
 
         <div class="detected">
             <strong>Detected Information:</strong><br>
@@ -182,7 +271,7 @@ Or reply to this email with the student's name.
 
         <div class="buttons">
             <p><strong>Click to assign:</strong></p>
-            {' '.join(links_html)}
+            {links_html}
         </div>
 
         <p style="text-align:center;color:#666;">Or reply to this email with the student's name.</p>
@@ -203,9 +292,20 @@ Or reply to this email with the student's name.
     }
 
 
+def _get_gmail() -> GmailService:
+    """Get the shared Gmail client, loading credentials on first use."""
+    global _gmail
+    if _gmail is None:
+        with _gmail_lock:
+            if _gmail is None:
+                _gmail = GmailService()
+    return _gmail
+
+
 def send_assignment_notification(
     document: ScannedDocument,
     recipient_email: str = None,
+    students: Optional[List[Student]] = None,
 ) -> bool:
     """
     Send email notification for a document needing assignment.
@@ -213,6 +313,7 @@ def send_assignment_notification(
     Args:
         document: The ScannedDocument needing assignment
         recipient_email: Email to send to (uses config if not specified)
+        students: Students to offer as links (queried if not specified)
 
     Returns:
         True if sent successfully, False otherwise
@@ -226,8 +327,9 @@ def send_assignment_notification(
 
     try:
         # Get all students
-        session = get_session()
-        students = session.query(Student).all()
+        if students is None:
+            session = get_session()
+            students = session.query(Student).all()
 
         if not students:
             logger.warning("No students in database")
@@ -241,7 +343,7 @@ def send_assignment_notification(
         )
 
         # Send via Gmail
-        gmail = GmailService()
+        gmail = _get_gmail()
         gmail.send_html_email(
             to=recipient,
             subject=email_content["subject"],
@@ -266,15 +368,40 @@ def send_pending_notifications() -> int:
     """
     session = get_session()
 
-    # Find documents without student assignment
+    # Every email offers the same students, so query them once
+    students = session.query(Student).all()
+
+    # Find documents without student assignment, streamed in batches
     pending_docs = session.query(ScannedDocument).filter(
         ScannedDocument.student_id.is_(None)
-    ).all()
-
+    ).yield_per(PENDING_BATCH_SIZE)
+
+    docs = iter(pending_docs)
+    batch = list(islice(docs, PENDING_BATCH_SIZE))
+    if not batch:
+        return 0
+
+    # Google credentials load lazily without a lock, so load them (and the
+    # Gmail client) here before the workers start: on a cold start several
+    # threads could otherwise refresh and write the token file at once, or
+    # each start the OAuth flow
+    if get_config().drive.notification_email and students:
+        try:
+            credentials = _get_gmail()._auth.credentials
+        except Exception as e:
+            logger.error(f"Failed to load Gmail credentials: {e}")
+            return 0
+        if credentials is None:
+            logger.error("No Gmail credentials, not sending notifications")
+            return 0
+
+    # Each send is a Gmail round-trip, so overlap them across threads
+    send = partial(send_assignment_notification, students=students)
     sent_count = 0
-    for doc in pending_docs:
-        if send_assignment_notification(doc):
-            sent_count += 1
+    with ThreadPoolExecutor(max_workers=NOTIFICATION_WORKERS) as pool:
+        while batch:
+            sent_count += sum(pool.map(send, batch))
+            batch = list(islice(docs, PENDING_BATCH_SIZE))
 
     return sent_count
 
@@ -6,16 +6,24 @@ Uses the Mistral OCR API to process scanned homework, tests, and other documents
 Supports images (PNG, JPEG, WEBP, GIF) and PDF files.
 """
 
+import io
 import os
 import base64
+import functools
+import random
 import time
 import logging
+import threading
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
+import httpx
 from mistralai import Mistral
 from mistralai.models import File
+from PIL import Image, ImageOps
+
+from config import get_config
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +31,7 @@ logger = logging.getLogger(__name__)
 MAX_RETRIES = 3
 INITIAL_RETRY_DELAY = 1
 MAX_RETRY_DELAY = 32
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
 
 # Supported formats
 SUPPORTED_IMAGE_FORMATS = {
@@ -35,8 +44,14 @@ SUPPORTED_IMAGE_FORMATS = {
 
 SUPPORTED_PDF_FORMATS = {".pdf"}
 
+# PDFs up to this size are sent inline instead of via the files API
+INLINE_PDF_MAX_BYTES = 4 * 1024 * 1024
+
+# Re-encode quality for downscaled images
+DOWNSCALE_JPEG_QUALITY = 85
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class OCRPage:
     """Single page of OCR results."""
     page_number: int
@@ -47,7 +62,7 @@ class OCRPage:
     dpi: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class OCRResult:
     """Complete OCR result for a document."""
     file_path: str
@@ -61,35 +76,134 @@ class OCRResult:
     model: str = ""
     success: bool = True
     error: Optional[str] = None
+    # Joined text, built on first access (pages are complete by then)
+    _full_text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _full_markdown: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
     @property
     def full_text(self) -> str:
         """Get all text concatenated."""
-        return "\n\n".join(page.text for page in self.pages)
+        if self._full_text is None:
+            self._full_text = "\n\n".join(page.text for page in self.pages)
+        return self._full_text
 
     @property
     def full_markdown(self) -> str:
         """Get all markdown concatenated."""
-        parts = []
-        for page in self.pages:
-            parts.append(f"## Page {page.page_number}\n\n{page.markdown}")
-        return "\n\n".join(parts)
+        if self._full_markdown is None:
+            self._full_markdown = "\n\n".join(
+                f"## Page {page.page_number}\n\n{page.markdown}" for page in self.pages
+            )
+        return self._full_markdown
+
+
+def downscale_image(image_bytes: bytes, mime_type: str, max_dim: int) -> Tuple[bytes, str]:
+    """
+    Shrink an image so its longest side is at most max_dim pixels.
+
+    Full-resolution phone and scanner captures add upload time without
+    improving OCR on printed grades. Images already within bounds, GIFs
+    (possibly animated) and anything Pillow can't decode are returned as-is.
+
+    Args:
+        image_bytes: Raw image data
+        mime_type: MIME type of image
+        max_dim: Maximum width/height in pixels (0 disables downscaling)
+
+    Returns:
+        Tuple of (image bytes, MIME type) to send to OCR
+    """
+    if not max_dim or mime_type == "image/gif":
+        return image_bytes, mime_type
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if max(img.size) <= max_dim:
+                return image_bytes, mime_type
+
+            # Bake in EXIF rotation, since it is dropped on re-encode
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+            buffer = io.BytesIO()
+            img.save(buffer, "JPEG", quality=DOWNSCALE_JPEG_QUALITY)
+    except Exception as e:
+        logger.warning(f"Could not downscale image, sending original: {e}")
+        return image_bytes, mime_type
+
+    return buffer.getvalue(), "image/jpeg"
+
+
+def _plain_text(markdown: str) -> str:
+    """Strip markdown escape backslashes, skipping the copy when there are none."""
+    return markdown.replace("\\", "") if "\\" in markdown else markdown
+
+
+def _pages_from_response(response) -> List[OCRPage]:
+    """Convert the pages of a Mistral OCR response into OCRPage objects."""
+    pages = []
+    for i, page in enumerate(response.pages, 1):
+        markdown = page.markdown
+        dims = page.dimensions
+        width, height, dpi = (dims.width, dims.height, dims.dpi) if dims else (None, None, None)
+        pages.append(OCRPage(
+            page_number=i,
+            text=_plain_text(markdown),
+            markdown=markdown,
+            width=width,
+            height=height,
+            dpi=dpi,
+        ))
+    return pages
+
+
+def data_url(content: bytes, mime_type: str) -> str:
+    """
+    Build a base64 data URL for inline OCR submission.
+
+    Args:
+        content: Raw file data
+        mime_type: MIME type of the data
+
+    Returns:
+        "data:<mime>;base64,..." string
+    """
+    return f"data:{mime_type};base64,{base64.b64encode(content).decode('utf-8')}"
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether an OCR API error is transient (network trouble, throttling, 5xx)."""
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
 
 
 def retry_with_backoff(func):
-    """Decorator for exponential backoff retry."""
+    """
+    Decorator for exponential backoff retry of transient API errors.
+
+    Anything else (bad requests, auth failures, bugs) is raised immediately.
+    Delays are jittered so parallel workers don't retry in lockstep.
+    """
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         delay = INITIAL_RETRY_DELAY
         for attempt in range(MAX_RETRIES):
             try:
                 return func(*args, **kwargs)
             except Exception as e:
+                if not _is_retryable(e):
+                    raise
                 if attempt == MAX_RETRIES - 1:
                     logger.error(f"Failed after {MAX_RETRIES} attempts: {e}")
                     raise
                 delay = min(delay * 2, MAX_RETRY_DELAY)
-                logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay}s...")
-                time.sleep(delay)
+                sleep_for = random.uniform(delay / 2, delay)
+                logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {sleep_for:.1f}s...")
+                time.sleep(sleep_for)
         return None
     return wrapper
 
@@ -104,12 +218,14 @@ class MistralOCR:
         print(result.full_text)
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, max_image_dim: int = 0):
         """
         Initialize Mistral OCR client.
 
         Args:
             api_key: Mistral API key (defaults to MISTRAL_API_KEY env var)
+            max_image_dim: Downscale images whose longest side exceeds this
+                many pixels before upload (0 sends originals)
         """
         self.api_key = api_key or os.getenv("MISTRAL_API_KEY")
         if not self.api_key:
@@ -119,6 +235,7 @@ class MistralOCR:
             )
         self.client = Mistral(api_key=self.api_key)
         self.model = "mistral-ocr-latest"
+        self.max_image_dim = max_image_dim
 
     def process_file(self, file_path: str) -> OCRResult:
         """
@@ -182,7 +299,7 @@ class MistralOCR:
             )
 
         try:
-            base64_image = base64.b64encode(image_bytes).decode("utf-8")
+            image_url = self._image_url(image_bytes, mime_type)
 
             @retry_with_backoff
             def perform_ocr():
@@ -190,23 +307,14 @@ class MistralOCR:
                     model=self.model,
                     document={
                         "type": "image_url",
-                        "image_url": f"data:{mime_type};base64,{base64_image}"
+                        "image_url": image_url
                     }
                 )
 
             response = perform_ocr()
             processing_time = time.time() - start_time
 
-            pages = []
-            for i, page in enumerate(response.pages):
-                pages.append(OCRPage(
-                    page_number=i + 1,
-                    text=page.markdown.replace("\\", ""),
-                    markdown=page.markdown,
-                    width=page.dimensions.width if page.dimensions else None,
-                    height=page.dimensions.height if page.dimensions else None,
-                    dpi=page.dimensions.dpi if page.dimensions else None,
-                ))
+            pages = _pages_from_response(response)
 
             return OCRResult(
                 file_path="",
@@ -233,6 +341,114 @@ class MistralOCR:
                 processing_time=time.time() - start_time,
             )
 
+    def process_pdf_bytes(self, pdf_bytes: bytes, filename: str) -> OCRResult:
+        """
+        Process a PDF from bytes (useful for cloud downloads).
+
+        Uploads the content directly, so callers don't need to round-trip
+        the download through a temporary file.
+
+        Args:
+            pdf_bytes: Raw PDF data
+            filename: Original filename
+
+        Returns:
+            OCRResult with extracted text
+        """
+        start_time = time.time()
+
+        logger.info(f"Processing PDF: {filename}")
+
+        try:
+            response = self._ocr_pdf(pdf_bytes, filename)
+            processing_time = time.time() - start_time
+
+            pages = _pages_from_response(response)
+
+            return OCRResult(
+                file_path="",
+                file_name=filename,
+                file_type="pdf",
+                mime_type="application/pdf",
+                pages=pages,
+                total_pages=len(pages),
+                processing_time=processing_time,
+                file_size_kb=len(pdf_bytes) / 1024,
+                model=response.model,
+                success=True,
+            )
+
+        except Exception as e:
+            logger.error(f"PDF OCR failed for {filename}: {e}")
+            return OCRResult(
+                file_path="",
+                file_name=filename,
+                file_type="pdf",
+                mime_type="application/pdf",
+                success=False,
+                error=str(e),
+                processing_time=time.time() - start_time,
+            )
+
+    def _image_url(self, image_bytes: bytes, mime_type: str) -> str:
+        """Build the data URL for an image, downscaled to max_image_dim."""
+        image_bytes, mime_type = downscale_image(image_bytes, mime_type, self.max_image_dim)
+        return data_url(image_bytes, mime_type)
+
+    def _ocr_pdf(self, pdf_bytes: bytes, filename: str):
+        """
+        Run OCR on PDF content and return the raw API response.
+
+        Small PDFs are sent inline as a base64 data URL, costing one
+        round-trip instead of three (upload, signed URL, OCR). Larger files
+        still go through the files API to keep request bodies bounded.
+
+        Args:
+            pdf_bytes: Raw PDF data
+            filename: Original filename
+
+        Returns:
+            Mistral OCR response
+        """
+        if len(pdf_bytes) <= INLINE_PDF_MAX_BYTES:
+            document_url = data_url(pdf_bytes, "application/pdf")
+        else:
+            # Upload PDF to Mistral
+            @retry_with_backoff
+            def upload_file():
+                return self.client.files.upload(
+                    file=File(
+                        file_name=filename,
+                        content=pdf_bytes,
+                    ),
+                    purpose="ocr"
+                )
+
+            uploaded = upload_file()
+
+            # Get signed URL
+            @retry_with_backoff
+            def get_url():
+                return self.client.files.get_signed_url(file_id=uploaded.id)
+
+            document_url = get_url().url
+
+        # Process OCR
+        @retry_with_backoff
+        def perform_ocr():
+            return self.client.ocr.process(
+                model=self.model,
+                document={
+                    "document_url": document_url,
+                    "type": "document_url"
+                },
+                include_image_base64=False,
+                image_limit=1000,
+                image_min_size=100
+            )
+
+        return perform_ocr()
+
     def _process_image(self, path: Path) -> OCRResult:
         """Process an image file."""
         start_time = time.time()
@@ -241,10 +457,9 @@ class MistralOCR:
         logger.info(f"Processing image: {path.name} ({mime_type})")
 
         try:
-            with open(path, "rb") as f:
-                image_bytes = f.read()
+            image_bytes = path.read_bytes()
 
-            base64_image = base64.b64encode(image_bytes).decode("utf-8")
+            image_url = self._image_url(image_bytes, mime_type)
 
             @retry_with_backoff
             def perform_ocr():
@@ -252,23 +467,14 @@ class MistralOCR:
                     model=self.model,
                     document={
                         "type": "image_url",
-                        "image_url": f"data:{mime_type};base64,{base64_image}"
+                        "image_url": image_url
                     }
                 )
 
             response = perform_ocr()
             processing_time = time.time() - start_time
 
-            pages = []
-            for i, page in enumerate(response.pages):
-                pages.append(OCRPage(
-                    page_number=i + 1,
-                    text=page.markdown.replace("\\", ""),
-                    markdown=page.markdown,
-                    width=page.dimensions.width if page.dimensions else None,
-                    height=page.dimensions.height if page.dimensions else None,
-                    dpi=page.dimensions.dpi if page.dimensions else None,
-                ))
+            pages = _pages_from_response(response)
 
             return OCRResult(
                 file_path=str(path),
@@ -278,7 +484,7 @@ class MistralOCR:
                 pages=pages,
                 total_pages=len(pages),
                 processing_time=processing_time,
-                file_size_kb=path.stat().st_size / 1024,
+                file_size_kb=len(image_bytes) / 1024,
                 model=response.model,
                 success=True,
             )
@@ -302,54 +508,12 @@ class MistralOCR:
         logger.info(f"Processing PDF: {path.name}")
 
         try:
-            # Upload PDF to Mistral
-            @retry_with_backoff
-            def upload_file():
-                with open(path, "rb") as f:
-                    return self.client.files.upload(
-                        file=File(
-                            file_name=path.name,
-                            content=f.read(),
-                        ),
-                        purpose="ocr"
-                    )
-
-            uploaded = upload_file()
-
-            # Get signed URL
-            @retry_with_backoff
-            def get_url():
-                return self.client.files.get_signed_url(file_id=uploaded.id)
-
-            signed_url = get_url()
-
-            # Process OCR
-            @retry_with_backoff
-            def perform_ocr():
-                return self.client.ocr.process(
-                    model=self.model,
-                    document={
-                        "document_url": signed_url.url,
-                        "type": "document_url"
-                    },
-                    include_image_base64=False,
-                    image_limit=1000,
-                    image_min_size=100
-                )
+            pdf_bytes = path.read_bytes()
 
-            response = perform_ocr()
+            response = self._ocr_pdf(pdf_bytes, path.name)
             processing_time = time.time() - start_time
 
-            pages = []
-            for i, page in enumerate(response.pages):
-                pages.append(OCRPage(
-                    page_number=i + 1,
-                    text=page.markdown.replace("\\", ""),
-                    markdown=page.markdown,
-                    width=page.dimensions.width if page.dimensions else None,
-                    height=page.dimensions.height if page.dimensions else None,
-                    dpi=page.dimensions.dpi if page.dimensions else None,
-                ))
+            pages = _pages_from_response(response)
 
             return OCRResult(
                 file_path=str(path),
@@ -359,7 +523,7 @@ class MistralOCR:
                 pages=pages,
                 total_pages=len(pages),
                 processing_time=processing_time,
-                file_size_kb=path.stat().st_size / 1024,
+                file_size_kb=len(pdf_bytes) / 1024,
                 model=response.model,
                 success=True,
             )
@@ -377,6 +541,26 @@ class MistralOCR:
             )
 
 
+# Shared client, so its HTTP connection pool is reused across files
+_ocr: Optional[MistralOCR] = None
+_ocr_lock = threading.Lock()
+
+
+def get_ocr() -> MistralOCR:
+    """
+    Get the shared Mistral OCR client.
+
+    Returns:
+        MistralOCR instance (created on first call)
+    """
+    global _ocr
+
+    with _ocr_lock:
+        if _ocr is None:
+            _ocr = MistralOCR(max_image_dim=get_config().scanner.max_ocr_dim)
+        return _ocr
+
+
 # =============================================================================
 # MAIN (for testing)
 # =============================================================================
@@ -19,7 +19,7 @@ from typing import Optional, List, Tuple
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedScore:
     """Extracted score information."""
     earned: float
@@ -29,7 +29,7 @@ class ParsedScore:
     raw_text: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedDocument:
     """Parsed information from a scanned document."""
     # Core extracted data
@@ -65,24 +65,49 @@ class GradeParser:
     - Assignment titles from headers
     """
 
-    # Score patterns (ordered by specificity)
+    # Score patterns (ordered by specificity). Patterns that open with a
+    # number only start at the beginning of a digit run ((?<!\d)): any match
+    # from inside a run would also match from its start, and retrying every
+    # offset made long digit strings in OCR noise quadratic. Quantifiers are
+    # possessive (*+, ++, ?+) wherever what follows can never match the
+    # characters they'd give back, so failed attempts don't backtrack; the
+    # whitespace before "$" stays greedy since it must be able to return a
+    # newline.
     SCORE_PATTERNS = [
         # "85/100" or "85 / 100" or "85 out of 100"
-        r"(\d+(?:\.\d+)?)\s*(?:/|out of|of)\s*(\d+(?:\.\d+)?)\s*(?:points?|pts?)?",
+        r"(?<!\d)(\d++(?:\.\d++)?+)\s*+(?:/|out of|of)\s*+(\d++(?:\.\d++)?+)\s*+(?:points?|pts?)?",
         # "Score: 85" with possible max
-        r"score[:\s]+(\d+(?:\.\d+)?)\s*(?:/\s*(\d+(?:\.\d+)?))?",
+        r"score[:\s]++(\d++(?:\.\d++)?+)\s*+(?:/\s*+(\d++(?:\.\d++)?+))?",
         # "Grade: 85%" or "85%"
-        r"(?:grade[:\s]+)?(\d+(?:\.\d+)?)\s*%",
+        r"(?:grade[:\s]++)?(?<!\d)(\d++(?:\.\d++)?+)\s*+%",
         # "Points: 45/50"
-        r"points?[:\s]+(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)",
+        r"points?[:\s]++(\d++(?:\.\d++)?+)\s*+/\s*+(\d++(?:\.\d++)?+)",
         # Raw fraction at end of line
-        r"(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)\s*$",
+        r"(?<!\d)(\d++(?:\.\d++)?+)\s*+/\s*+(\d++(?:\.\d++)?+)\s*$",
+    ]
+
+    # Literals each score pattern can't match without (any one suffices),
+    # checked against the lowercased text so patterns with nothing to find
+    # never reach the regex engine - most OCR text has no "/" at all. Hints
+    # (here and for the letter grade and date patterns) avoid i and s:
+    # IGNORECASE also matches non-ASCII letters for those (dotted/dotless i,
+    # long s) that str.lower() doesn't map to them.
+    SCORE_PATTERN_HINTS = [
+        ("/", "of"),
+        ("core",),
+        ("%",),
+        ("/",),
+        ("/",),
     ]
 
     # Letter grade patterns
     LETTER_GRADE_PATTERNS = [
-        r"grade[:\s]*([A-F][+-]?)",
-        r"\b([A-F][+-]?)\s*(?:\d+%|\(\d+)",  # "A (95%)" or "B+ 88%"
+        r"grade[:\s]*+([A-F][+-]?)",
+        r"\b([A-F][+-]?+)\s*+(?:\d++%|\(\d++)",  # "A (95%)" or "B+ 88%"
+    ]
+    LETTER_GRADE_PATTERN_HINTS = [
+        ("rade",),
+        ("%", "("),
     ]
 
     # Date patterns
@@ -98,16 +123,44 @@ class GradeParser:
         # YYYY-MM-DD
         (r"(\d{4})-(\d{2})-(\d{2})", "%Y-%m-%d"),
     ]
+    # Month names are hinted by their first three letters ("ep" for Sep, to
+    # avoid the s)
+    _MONTH_HINTS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "ep", "oct", "nov", "dec")
+    DATE_PATTERN_HINTS = [
+        ("/", "-"),
+        ("/", "-"),
+        _MONTH_HINTS,
+        _MONTH_HINTS,
+        ("-",),
+    ]
+
+    # Month names and abbreviations used by the DATE_PATTERNS above
+    MONTH_NAMES = {
+        "january": 1, "jan": 1,
+        "february": 2, "feb": 2,
+        "march": 3, "mar": 3,
+        "april": 4, "apr": 4,
+        "may": 5,
+        "june": 6, "jun": 6,
+        "july": 7, "jul": 7,
+        "august": 8, "aug": 8,
+        "september": 9, "sep": 9,
+        "october": 10, "oct": 10,
+        "november": 11, "nov": 11,
+        "december": 12, "dec": 12,
+    }
 
     # Title patterns (headers, labels)
     TITLE_PATTERNS = [
         r"^(?:name[:\s]*)?(.+?)\s*(?:test|quiz|exam|homework|hw|assignment|worksheet)",
         r"(?:test|quiz|exam|homework|hw|assignment|worksheet)[:\s]*(.+?)$",
-        r"^chapter\s+\d+.*",
-        r"^unit\s+\d+.*",
-        r"^lesson\s+\d+.*",
     ]
 
+    # Numbered section headings ("Chapter 3 Review"), also used as titles.
+    # They're matched in one fused pass - no two can start at the same
+    # place - and reported grouped in this order.
+    HEADING_WORDS = ["chapter", "unit", "lesson"]
+
     # Common subject/course indicators
     COURSE_PATTERNS = [
         r"(?:class|course|subject)[:\s]*(.+?)(?:\n|$)",
@@ -124,28 +177,72 @@ class GradeParser:
         """Initialize the parser."""
         self._compile_patterns()
 
-    def _compile_patterns(self):
-        """Pre-compile regex patterns for performance."""
-        self._score_patterns = [
-            re.compile(p, re.IGNORECASE | re.MULTILINE)
-            for p in self.SCORE_PATTERNS
-        ]
-        self._letter_patterns = [
-            re.compile(p, re.IGNORECASE)
-            for p in self.LETTER_GRADE_PATTERNS
+    @staticmethod
+    def _line_flags(pattern: str) -> int:
+        """
+        MULTILINE for patterns anchored to a line start or end, else no flag.
+
+        The patterns that only contain a $ inside a group ("(?:\\n|$)") match
+        the same text either way, so they're left unflagged too.
+        """
+        if pattern.startswith("^") or pattern.endswith("$"):
+            return re.MULTILINE
+        return 0
+
+    @classmethod
+    def _compile_patterns(cls):
+        """
+        Pre-compile regex patterns for performance.
+
+        Compiled once per class and shared by every instance, so creating a
+        parser per processor (or per CLI call) costs nothing after the first.
+        """
+        if cls.__dict__.get("_patterns_compiled"):
+            return
+
+        # Each score pattern is scanned separately: their matches overlap
+        # (e.g. "Score: 42/50" hits three), and every hit is reported.
+        # Whether a pattern captures a possible-points group is fixed at
+        # compile time, so it's resolved here instead of per match.
+        cls._score_patterns = []
+        for p, hints in zip(cls.SCORE_PATTERNS, cls.SCORE_PATTERN_HINTS):
+            pattern = re.compile(p, re.IGNORECASE | cls._line_flags(p))
+            cls._score_patterns.append((pattern, pattern.groups >= 2, hints))
+        cls._letter_patterns = [
+            (re.compile(p, re.IGNORECASE), hints)
+            for p, hints in zip(cls.LETTER_GRADE_PATTERNS, cls.LETTER_GRADE_PATTERN_HINTS)
         ]
-        self._title_patterns = [
-            re.compile(p, re.IGNORECASE | re.MULTILINE)
-            for p in self.TITLE_PATTERNS
+        cls._title_patterns = [
+            re.compile(p, re.IGNORECASE | cls._line_flags(p))
+            for p in cls.TITLE_PATTERNS
         ]
-        self._course_patterns = [
-            re.compile(p, re.IGNORECASE | re.MULTILINE)
-            for p in self.COURSE_PATTERNS
+        heading_words = "|".join(f"(?P<{word}>{word})" for word in cls.HEADING_WORDS)
+        cls._heading_pattern = re.compile(
+            rf"^(?:{heading_words})\s+\d+.*", re.IGNORECASE | re.MULTILINE
+        )
+        cls._course_patterns = [
+            re.compile(p, re.IGNORECASE | cls._line_flags(p))
+            for p in cls.COURSE_PATTERNS
         ]
-        self._name_patterns = [
-            re.compile(p, re.MULTILINE)
-            for p in self.NAME_PATTERNS
+        # Every name pattern in one scan. Each is a lookahead, so a match
+        # for one never consumes text another could have matched; which
+        # pattern hit is told by its (only) capture group.
+        cls._name_pattern = re.compile(
+            "|".join(f"(?={p})" for p in cls.NAME_PATTERNS), re.MULTILINE
+        )
+        cls._date_patterns = [
+            (re.compile(p, re.IGNORECASE), fmt, hints)
+            for (p, fmt), hints in zip(cls.DATE_PATTERNS, cls.DATE_PATTERN_HINTS)
         ]
+        cls._date_context_pattern = re.compile(r"date|due|\d{4}", re.IGNORECASE)
+        cls._title_prefix_pattern = re.compile(r"^(name[:\s]*|date[:\s]*)", re.IGNORECASE)
+        cls._title_suffix_pattern = re.compile(r"\s*[-_]\s*$")
+        cls._head_skip_pattern = re.compile(r"\d+[/-]|score|grade|name|date", re.IGNORECASE)
+        # Keyword context for the confidence scores
+        cls._score_keyword_pattern = re.compile(r"(?:score|grade|points?)\Z", re.IGNORECASE)
+        cls._date_keyword_pattern = re.compile(r"date|due|test|quiz|submitted", re.IGNORECASE)
+        cls._keyword_gap_pattern = re.compile(r"[:\s]*")
+        cls._patterns_compiled = True
 
     def parse(self, text: str) -> ParsedDocument:
         """
@@ -158,10 +255,12 @@ class GradeParser:
             ParsedDocument with extracted information
         """
         result = ParsedDocument(raw_text=text)
+        # Lowercased once for the plain substring checks below
+        text_lower = text.lower()
 
         # Extract all components
-        result.all_scores = self._extract_scores(text)
-        result.all_dates = self._extract_dates(text)
+        result.all_scores = self._extract_scores(text, text_lower)
+        result.all_dates = self._extract_dates(text, text_lower)
         result.all_titles = self._extract_titles(text)
 
         # Pick best matches
@@ -175,7 +274,7 @@ class GradeParser:
 
         if result.all_titles:
             result.title = result.all_titles[0]
-            result.title_confidence = self._calculate_title_confidence(result.title, text)
+            result.title_confidence = self._calculate_title_confidence(result.title, text_lower)
 
         # Extract student name and course
         result.student_name = self._extract_student_name(text)
@@ -183,36 +282,41 @@ class GradeParser:
 
         return result
 
-    def _extract_scores(self, text: str) -> List[ParsedScore]:
+    def _extract_scores(self, text: str, text_lower: str) -> List[ParsedScore]:
         """Extract all potential scores from text."""
         scores = []
 
-        for pattern in self._score_patterns:
+        for pattern, has_possible, hints in self._score_patterns:
+            if not any(hint in text_lower for hint in hints):
+                continue
             for match in pattern.finditer(text):
-                groups = match.groups()
+                first, second = match.group(1, 2) if has_possible else (match.group(1), None)
                 try:
-                    if len(groups) >= 2 and groups[1]:
-                        earned = float(groups[0])
-                        possible = float(groups[1])
+                    if second:
+                        # Cheapest rejections first: most numeric noise fails
+                        # the range checks before the date-context search
+                        possible = float(second)
+                        if not 0 < possible <= 1000:
+                            continue
+                        earned = float(first)
+                        percentage = (earned / possible) * 100
+                        # Skip unrealistic percentages (likely date fragments)
+                        if percentage > 200:
+                            continue
 
                         # Skip if this looks like a date (month/day or day/year)
                         if self._looks_like_date(earned, possible, match.group(0)):
                             continue
 
-                        if possible > 0:
-                            percentage = (earned / possible) * 100
-                            # Skip unrealistic percentages (likely date fragments)
-                            if percentage > 200 or possible > 1000:
-                                continue
-                            scores.append(ParsedScore(
-                                earned=earned,
-                                possible=possible,
-                                percentage=round(percentage, 1),
-                                raw_text=match.group(0)
-                            ))
-                    elif len(groups) >= 1:
+                        scores.append(ParsedScore(
+                            earned=earned,
+                            possible=possible,
+                            percentage=round(percentage, 1),
+                            raw_text=match.group(0)
+                        ))
+                    else:
                         # Percentage only
-                        percentage = float(groups[0])
+                        percentage = float(first)
                         if 0 <= percentage <= 100:
                             scores.append(ParsedScore(
                                 earned=percentage,
@@ -224,7 +328,9 @@ class GradeParser:
                     continue
 
         # Extract letter grades
-        for pattern in self._letter_patterns:
+        for pattern, hints in self._letter_patterns:
+            if not any(hint in text_lower for hint in hints):
+                continue
             for match in pattern.finditer(text):
                 letter = match.group(1).upper()
                 # Update scores with letter grade if found
@@ -269,19 +375,21 @@ class GradeParser:
             return True
 
         # Check if the raw text has date-like context
-        date_context = re.search(r"date|due|\d{4}", raw_text, re.I)
+        date_context = self._date_context_pattern.search(raw_text)
         if date_context and (1 <= num1 <= 31 or 1 <= num2 <= 31):
             return True
 
         return False
 
-    def _extract_dates(self, text: str) -> List[datetime]:
+    def _extract_dates(self, text: str, text_lower: str) -> List[datetime]:
         """Extract all potential dates from text."""
         dates = []
-        current_year = datetime.now().year
+        now = datetime.now()
+        current_year = now.year
 
-        for pattern_str, fmt in self.DATE_PATTERNS:
-            pattern = re.compile(pattern_str, re.IGNORECASE)
+        for pattern, fmt, hints in self._date_patterns:
+            if not any(hint in text_lower for hint in hints):
+                continue
             for match in pattern.finditer(text):
                 try:
                     if fmt:
@@ -296,21 +404,7 @@ class GradeParser:
                         year = int(groups[2])
 
                         # Parse month name
-                        month_names = {
-                            "january": 1, "jan": 1,
-                            "february": 2, "feb": 2,
-                            "march": 3, "mar": 3,
-                            "april": 4, "apr": 4,
-                            "may": 5,
-                            "june": 6, "jun": 6,
-                            "july": 7, "jul": 7,
-                            "august": 8, "aug": 8,
-                            "september": 9, "sep": 9,
-                            "october": 10, "oct": 10,
-                            "november": 11, "nov": 11,
-                            "december": 12, "dec": 12,
-                        }
-                        month = month_names.get(month_str.lower(), 1)
+                        month = self.MONTH_NAMES.get(month_str.lower(), 1)
                         date = datetime(year, month, day)
 
                     # Sanity check: date should be within reasonable range
@@ -321,7 +415,6 @@ class GradeParser:
                     continue
 
         # Sort by proximity to current date
-        now = datetime.now()
         dates.sort(key=lambda d: abs((d - now).days))
 
         return dates
@@ -329,48 +422,60 @@ class GradeParser:
     def _extract_titles(self, text: str) -> List[str]:
         """Extract potential assignment/test titles."""
         titles = []
-        lines = text.split("\n")
 
-        for pattern in self._title_patterns:
-            for match in pattern.finditer(text):
-                title = match.group(0).strip()
-                if title and len(title) > 3:
-                    titles.append(self._clean_title(title))
+        candidates = [
+            match.group(0)
+            for pattern in self._title_patterns
+            for match in pattern.finditer(text)
+        ]
+        headings = {word: [] for word in self.HEADING_WORDS}
+        for match in self._heading_pattern.finditer(text):
+            headings[match.lastgroup].append(match.group(0))
+        for word in self.HEADING_WORDS:
+            candidates.extend(headings[word])
+
+        for title in candidates:
+            title = title.strip()
+            if title and len(title) > 3:
+                titles.append(self._clean_title(title))
 
         # Also check first few non-empty lines as potential titles
-        for line in lines[:5]:
+        # (split stops after them instead of splitting the whole page)
+        for line in text.split("\n", 5)[:5]:
             line = line.strip()
             if line and len(line) > 5 and len(line) < 100:
                 # Skip lines that look like scores or dates
-                if not re.search(r"^\d+[/-]|^score|^grade|^name|^date", line, re.I):
+                if not self._head_skip_pattern.match(line):
                     titles.append(self._clean_title(line))
 
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_titles = []
+        # Remove duplicates (case-insensitively) while preserving order;
+        # later spellings don't replace the first one seen
+        unique_titles = {}
         for t in titles:
-            t_lower = t.lower()
-            if t_lower not in seen:
-                seen.add(t_lower)
-                unique_titles.append(t)
+            unique_titles.setdefault(t.lower(), t)
 
-        return unique_titles
+        return list(unique_titles.values())
 
     def _clean_title(self, title: str) -> str:
         """Clean up extracted title."""
         # Remove common prefixes/suffixes
-        title = re.sub(r"^(name[:\s]*|date[:\s]*)", "", title, flags=re.I)
-        title = re.sub(r"\s*[-_]\s*$", "", title)
+        title = self._title_prefix_pattern.sub("", title)
+        title = self._title_suffix_pattern.sub("", title)
         return title.strip()
 
     def _extract_student_name(self, text: str) -> Optional[str]:
         """Extract student name from text."""
-        for pattern in self._name_patterns:
-            match = pattern.search(text)
-            if match:
-                name = match.group(1).strip()
-                if len(name.split()) >= 2:  # At least first and last name
-                    return name
+        # First match of each pattern, by pattern order
+        first_matches = {}
+        for match in self._name_pattern.finditer(text):
+            first_matches.setdefault(match.lastindex, match.group(match.lastindex))
+            if 1 in first_matches:
+                break
+
+        for index in sorted(first_matches):
+            name = first_matches[index].strip()
+            if len(name.split()) >= 2:  # At least first and last name
+                return name
         return None
 
     def _extract_course_name(self, text: str) -> Optional[str]:
@@ -381,6 +486,44 @@ class GradeParser:
                 return match.group(1).strip() if match.lastindex else match.group(0).strip()
         return None
 
+    def _follows_score_keyword(self, raw_text: str, text: str) -> bool:
+        """
+        Check whether raw_text appears right after "score", "grade" or
+        "point(s)" (plus any colons/whitespace), ignoring case.
+
+        raw_text comes from this text, so its occurrences are found as
+        written. Keywords end in a letter, so one has to end exactly where
+        the colons/whitespace before an occurrence start; only those few
+        characters are searched with the precompiled keyword pattern.
+        """
+        # Occurrences can overlap ("1/1/1"), so resume one past each start
+        pos = text.find(raw_text)
+        while pos >= 0:
+            gap_start = pos
+            while gap_start and (text[gap_start - 1] == ":" or text[gap_start - 1].isspace()):
+                gap_start -= 1
+            if self._score_keyword_pattern.search(text, max(0, gap_start - 6), gap_start):
+                return True
+            pos = text.find(raw_text, pos + 1)
+        return False
+
+    def _follows_date_keyword(self, date: datetime, text: str) -> bool:
+        """
+        Check whether the date's month/day ("1/15" or "1-15") appears after
+        a date keyword, on the line where the text after it resumes.
+        """
+        targets = (f"{date.month}/{date.day}", f"{date.month}-{date.day}")
+        pos = 0
+        # Keywords can overlap ("datest"), so resume one past each start
+        while match := self._date_keyword_pattern.search(text, pos):
+            pos = match.start() + 1
+            start = self._keyword_gap_pattern.match(text, match.end()).end()
+            end = text.find("\n", start)
+            line = text[start:] if end < 0 else text[start:end]
+            if targets[0] in line or targets[1] in line:
+                return True
+        return False
+
     def _calculate_score_confidence(self, score: ParsedScore, text: str) -> float:
         """Calculate confidence in extracted score."""
         confidence = 50.0
@@ -390,11 +533,7 @@ class GradeParser:
             confidence += 20
 
         # Higher confidence if score appears near keywords
-        score_context = re.search(
-            rf"(?:score|grade|points?)[:\s]*{re.escape(score.raw_text)}",
-            text, re.I
-        )
-        if score_context:
+        if self._follows_score_keyword(score.raw_text, text):
             confidence += 20
 
         # Letter grade increases confidence
@@ -408,11 +547,8 @@ class GradeParser:
         confidence = 50.0
 
         # Higher confidence if date appears near keywords
-        date_keywords = ["date", "due", "test", "quiz", "submitted"]
-        for keyword in date_keywords:
-            if re.search(rf"{keyword}[:\s]*.*{date.month}[/-]{date.day}", text, re.I):
-                confidence += 15
-                break
+        if self._follows_date_keyword(date, text):
+            confidence += 15
 
         # Recent dates are more likely correct
         days_diff = abs((datetime.now() - date).days)
@@ -423,19 +559,18 @@ class GradeParser:
 
         return min(confidence, 100)
 
-    def _calculate_title_confidence(self, title: str, text: str) -> float:
-        """Calculate confidence in extracted title."""
+    def _calculate_title_confidence(self, title: str, text_lower: str) -> float:
+        """Calculate confidence in extracted title (text_lower: lowercased OCR text)."""
         confidence = 40.0
+        title_lower = title.lower()
 
         # Keywords increase confidence
         keywords = ["test", "quiz", "exam", "homework", "assignment", "chapter", "unit"]
-        for keyword in keywords:
-            if keyword in title.lower():
-                confidence += 15
-                break
+        if any(keyword in title_lower for keyword in keywords):
+            confidence += 15
 
         # Title appearing at start of document
-        if text.strip().lower().startswith(title.lower()[:20]):
+        if text_lower.strip().startswith(title_lower[:20]):
             confidence += 20
 
         # Longer titles that aren't too long
@@ -476,3 +611,7 @@ if __name__ == "__main__":
         print(f"  (confidence: {result.score_confidence:.0f}%)")
     print(f"  Student: {result.student_name}")
     print(f"  Course: {result.course_name}")
+
+    # Overlapping keywords: "test" inside "datest" still counts
+    overlap = parser.parse("Quiz datest\n1/15/2025")
+    assert overlap.date_confidence == 65, overlap.date_confidence
@@ -9,18 +9,35 @@ Uses multiple signals to determine document ownership:
 4. Assignment Context - 75% for strong title match
 """
 
+import hashlib
 import logging
-from dataclasses import dataclass, field
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
 from typing import Optional, List
-from difflib import SequenceMatcher
 
-from sqlalchemy.orm import Session
+# CyDifflib is a compiled drop-in for difflib (same algorithm and results)
+try:
+    from cydifflib import SequenceMatcher
+except ImportError:
+    from difflib import SequenceMatcher
+
+from sqlalchemy.orm import Session, contains_eager
 
 from database.models import Student, Course, Assignment
 from .parser import ParsedDocument
 
 logger = logging.getLogger(__name__)
 
+# OCR artifacts (anything but word characters and whitespace) on cover sheets
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+
+
+def _clean_cover_text(text: str) -> str:
+    """Remove OCR artifacts and normalize whitespace."""
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
 
 @dataclass
 class StudentDetection:
@@ -36,6 +53,16 @@ class StudentDetection:
         return self.confidence >= 70 and self.student is not None
 
 
+@dataclass(slots=True)
+class _StudentIndex:
+    """Students with their names normalized once, one list per field."""
+    students: List[Student]
+    names_lower: List[str]
+    parts_lower: List[List[str]]  # Lowercased name split into words
+    names_upper: List[str]
+    first_upper: List[str]  # Uppercased first word of the name
+
+
 class StudentDetector:
     """
     Detects which student a scanned document belongs to.
@@ -54,16 +81,33 @@ class StudentDetector:
     ASSIGNMENT_MATCH_CONFIDENCE = 75
     TITLE_SIMILARITY_THRESHOLD = 0.7
 
-    def __init__(self, session: Session):
+    # Detections remembered per detector (repeated or re-run pages)
+    DETECT_CACHE_SIZE = 4096
+
+    # SequenceMatchers kept per detector (most recently used names)
+    SEQUENCE_MATCHER_CACHE_SIZE = 1024
+
+    def __init__(self, session: Session, students: Optional[List[Student]] = None):
         """
         Initialize detector with database session.
 
         Args:
             session: SQLAlchemy database session
+            students: Preloaded students (queried on first use if omitted)
         """
         self.session = session
-        self._students = None
-        self._courses_by_student = None
+        self._students = students
+        self._student_index = None
+        self._student_courses = None
+        self._name_variant_index = None
+
+        # SequenceMatchers keyed by the name they index (see _similarity),
+        # oldest first
+        self._matchers: OrderedDict = OrderedDict()
+
+        # Recent detections keyed by their inputs (the page text by its
+        # digest), oldest first; see clear_cache
+        self._detect_cache: OrderedDict = OrderedDict()
 
     @property
     def students(self) -> List[Student]:
@@ -72,16 +116,127 @@ class StudentDetector:
             self._students = self.session.query(Student).all()
         return self._students
 
-    def _get_courses_by_student(self) -> dict:
-        """Get courses grouped by student ID (cached)."""
-        if self._courses_by_student is None:
-            self._courses_by_student = {}
+    def _get_student_index(self) -> _StudentIndex:
+        """Get students with their normalized names (cached)."""
+        if self._student_index is None:
+            students = self.students
+            names_lower = [student.name.lower() for student in students]
+            names_upper = [student.name.upper() for student in students]
+            self._student_index = _StudentIndex(
+                students=students,
+                names_lower=names_lower,
+                parts_lower=[name.split() for name in names_lower],
+                names_upper=names_upper,
+                first_upper=[name.split()[0] for name in names_upper],
+            )
+        return self._student_index
+
+    def _get_student_courses(self) -> List[tuple]:
+        """
+        Get active courses as one flat list (cached).
+
+        Returns:
+            (student, course, lowercased course name) tuples, grouped by
+            student in self.students order
+        """
+        if self._student_courses is None:
+            courses_by_student = {}
             courses = self.session.query(Course).filter_by(is_active=True).all()
             for course in courses:
-                if course.student_id not in self._courses_by_student:
-                    self._courses_by_student[course.student_id] = []
-                self._courses_by_student[course.student_id].append(course)
-        return self._courses_by_student
+                courses_by_student.setdefault(course.student_id, []).append(course)
+            self._student_courses = [
+                (student, course, course.name.lower())
+                for student in self.students
+                for course in courses_by_student.get(student.id, [])
+            ]
+        return self._student_courses
+
+    def _get_name_variant_index(self) -> tuple:
+        """
+        Get the cover sheet name variants as one search pattern (cached).
+
+        Returns:
+            (pattern, prefixes): pattern finds the longest uppercased first
+            or full name starting at each position, and prefixes maps each
+            variant to the variants it starts with (itself included)
+        """
+        if self._name_variant_index is None:
+            index = self._get_student_index()
+            variants = set(index.first_upper)
+            variants.update(index.names_upper)
+
+            # A lookahead consumes nothing, so every position is tried; the
+            # longest alternatives go first so each hit is the longest
+            # variant there, and any shorter one at the same place is a
+            # prefix of it
+            alternatives = "|".join(
+                re.escape(variant) for variant in sorted(variants, key=len, reverse=True)
+            )
+            pattern = re.compile(f"(?=({alternatives}))") if variants else None
+            prefixes = {
+                variant: [other for other in variants if variant.startswith(other)]
+                for variant in variants
+            }
+            self._name_variant_index = (pattern, prefixes)
+        return self._name_variant_index
+
+    def _find_name_variants(self, text: str) -> dict:
+        """
+        Find where each student name variant first appears, in one scan.
+
+        Args:
+            text: Uppercased, cleaned text to search
+
+        Returns:
+            Dict of variant -> position of its first occurrence
+        """
+        pattern, prefixes = self._get_name_variant_index()
+        positions = {}
+        if pattern is None or not text:
+            return positions
+        for match in pattern.finditer(text):
+            for variant in prefixes[match.group(1)]:
+                positions.setdefault(variant, match.start())
+        return positions
+
+    def _similarity(self, a: str, b: str, floor: float = 0.0) -> float:
+        """
+        Calculate the SequenceMatcher ratio between two strings.
+
+        SequenceMatcher indexes its second string, which here is a student,
+        course or assignment name compared against every document, so one
+        matcher per name is kept and only the first string is swapped in.
+
+        Args:
+            a: String to compare
+            b: Name to compare against
+            floor: Ratio the caller needs to beat; pairs whose cheap upper
+                bounds (length, then character counts) can't exceed it
+                skip the full comparison
+
+        Returns:
+            Similarity ratio (0-1), or 0.0 if it can't be above floor
+        """
+        matcher = self._matchers.get(b)
+        if matcher is None:
+            matcher = self._matchers[b] = SequenceMatcher(None, "", b)
+            if len(self._matchers) > self.SEQUENCE_MATCHER_CACHE_SIZE:
+                self._matchers.popitem(last=False)
+        else:
+            self._matchers.move_to_end(b)
+        matcher.set_seq1(a)
+        if floor and (matcher.real_quick_ratio() <= floor or matcher.quick_ratio() <= floor):
+            return 0.0
+        return matcher.ratio()
+
+    def clear_cache(self):
+        """
+        Forget remembered detections.
+
+        Assignment title matches query the database, so call this at the
+        start of each processing run to pick up assignments synced since.
+        """
+        self._detect_cache.clear()
 
     def detect(self, parsed: ParsedDocument, qr_data: dict = None, raw_text: str = None) -> StudentDetection:
         """
@@ -95,6 +250,35 @@ class StudentDetector:
         Returns:
             StudentDetection with student, confidence, and reasoning
         """
+        # Within a run, detection only depends on these inputs, so repeats
+        # of the same page reuse the earlier result (only the QR student ID
+        # is read, and the page text is kept as a digest, not the text)
+        text = raw_text or parsed.raw_text
+        key = (
+            tuple(student.id for student in self.students),
+            qr_data.get("student_id") if qr_data else None,
+            parsed.student_name,
+            parsed.course_name,
+            parsed.title,
+            parsed.date,
+            hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+            if text else None,
+        )
+
+        result = self._detect_cache.get(key)
+        if result is None:
+            result = self._detect(parsed, qr_data, raw_text)
+            self._detect_cache[key] = result
+            if len(self._detect_cache) > self.DETECT_CACHE_SIZE:
+                self._detect_cache.popitem(last=False)
+        else:
+            self._detect_cache.move_to_end(key)
+
+        # Callers get their own copy, so changes don't leak into the cache
+        return replace(result, reasons=list(result.reasons))
+
+    def _detect(self, parsed: ParsedDocument, qr_data: Optional[dict], raw_text: Optional[str]) -> StudentDetection:
+        """Run the detection methods in order (see detect)."""
         reasons = []
 
         # 1. Try QR code (highest confidence)
@@ -175,35 +359,33 @@ class StudentDetector:
         Returns:
             StudentDetection with high confidence if cover sheet found
         """
-        import re
-
         # Check both beginning and end of document
         # Cover sheet at start: first 500 chars
         # Cover sheet at end: last 500 chars (scanner feeds from bottom)
         first_part = text[:500].upper()
         last_part = text[-500:].upper() if len(text) > 500 else ""
 
-        def clean_text(t: str) -> str:
-            """Remove OCR artifacts and normalize whitespace."""
-            cleaned = re.sub(r'[^\w\s]', ' ', t)
-            return ' '.join(cleaned.split())
+        first_part_clean = _clean_cover_text(first_part)
+        last_part_clean = _clean_cover_text(last_part)
 
-        first_part_clean = clean_text(first_part)
-        last_part_clean = clean_text(last_part)
+        # First position of every name variant in each part
+        first_positions = self._find_name_variants(first_part_clean)
+        last_positions = self._find_name_variants(last_part_clean)
 
         best_match = None
         best_position = float('inf')
         found_at_end = False
 
-        for student in self.students:
-            # Get variations of student name to check
-            name_upper = student.name.upper()
-            first_name = name_upper.split()[0]
+        index = self._get_student_index()
+        for student, first_name, name_upper in zip(
+            index.students, index.first_upper, index.names_upper
+        ):
+            # Variations of student name to check: first name, full name
 
             # Check FIRST part of document
             for name_variant in [first_name, name_upper]:
-                if name_variant in first_part_clean:
-                    pos = first_part_clean.find(name_variant)
+                pos = first_positions.get(name_variant)
+                if pos is not None:
                     if pos < best_position:
                         best_match = student
                         best_position = pos
@@ -212,8 +394,8 @@ class StudentDetector:
             # Check LAST part of document (cover sheet at end due to scanner feed)
             if last_part_clean:
                 for name_variant in [first_name, name_upper]:
-                    if name_variant in last_part_clean:
-                        pos = last_part_clean.find(name_variant)
+                    pos = last_positions.get(name_variant)
+                    if pos is not None:
                         # For end of document, treat early position as high confidence
                         if pos < 200 and (best_position > 200 or found_at_end):
                             best_match = student
@@ -259,9 +441,10 @@ class StudentDetector:
         best_confidence = 0
         reasons = []
 
-        for student in self.students:
-            student_name_lower = student.name.lower()
-            student_parts = student_name_lower.split()
+        index = self._get_student_index()
+        for student, student_name_lower, student_parts in zip(
+            index.students, index.names_lower, index.parts_lower
+        ):
 
             # Exact match
             if name_lower == student_name_lower:
@@ -289,7 +472,7 @@ class StudentDetector:
                         reasons = [f"Last name match: '{name_parts[-1]}' in '{student.name}'"]
 
             # Fuzzy match
-            similarity = SequenceMatcher(None, name_lower, student_name_lower).ratio()
+            similarity = self._similarity(name_lower, student_name_lower, 0.8)
             if similarity > 0.8:
                 fuzzy_confidence = int(similarity * 100)
                 if fuzzy_confidence > best_confidence:
@@ -315,26 +498,25 @@ class StudentDetector:
     def _detect_from_course(self, course_name: str) -> StudentDetection:
         """Detect student from course name."""
         course_lower = course_name.lower().strip()
-        courses_by_student = self._get_courses_by_student()
 
         matching_students = []
         reasons = []
 
-        for student in self.students:
-            student_courses = courses_by_student.get(student.id, [])
-            for course in student_courses:
-                course_name_lower = course.name.lower()
-
-                # Check for course name match
-                if course_lower in course_name_lower or course_name_lower in course_lower:
-                    matching_students.append((student, course))
-                    break
-
-                # Fuzzy match on course name
-                similarity = SequenceMatcher(None, course_lower, course_name_lower).ratio()
-                if similarity > 0.7:
-                    matching_students.append((student, course))
-                    break
+        # Each student's first matching course counts; the rest of that
+        # student's courses are skipped
+        matched = None
+        for student, course, course_name_lower in self._get_student_courses():
+            if student is matched:
+                continue
+
+            # Check for course name match, then fuzzy match on course name
+            if (
+                course_lower in course_name_lower
+                or course_name_lower in course_lower
+                or self._similarity(course_lower, course_name_lower, 0.7) > 0.7
+            ):
+                matching_students.append((student, course))
+                matched = student
 
         if len(matching_students) == 1:
             student, course = matching_students[0]
@@ -364,14 +546,16 @@ class StudentDetector:
         """Detect student from assignment title match."""
         title_lower = title.lower().strip()
 
-        # Query recent assignments
-        query = self.session.query(Assignment).join(Course).filter(
+        # Query recent assignments, loading each one's course and student
+        # in the same query
+        query = self.session.query(Assignment).join(Course).options(
+            contains_eager(Assignment.course).joinedload(Course.student)
+        ).filter(
             Course.is_active == True
         )
 
         # If we have a date, narrow the search
         if date:
-            from datetime import timedelta
             query = query.filter(
                 Assignment.due_at.between(
                     date - timedelta(days=14),
@@ -380,7 +564,6 @@ class StudentDetector:
             )
         else:
             # Look at recent assignments only
-            from datetime import datetime, timedelta
             cutoff = datetime.now() - timedelta(days=60)
             query = query.filter(Assignment.due_at >= cutoff)
 
@@ -392,15 +575,13 @@ class StudentDetector:
 
         for assignment in assignments:
             assignment_title_lower = assignment.name.lower()
-            similarity = SequenceMatcher(None, title_lower, assignment_title_lower).ratio()
+            similarity = self._similarity(title_lower, assignment_title_lower, best_similarity)
 
             if similarity > best_similarity:
                 best_similarity = similarity
                 best_assignment = assignment
                 # Get student from course
-                course = self.session.query(Course).filter_by(id=assignment.course_id).first()
-                if course:
-                    best_match = self.session.query(Student).filter_by(id=course.student_id).first()
+                best_match = assignment.course.student
 
         if best_match and best_similarity >= self.TITLE_SIMILARITY_THRESHOLD:
             confidence = int(best_similarity * self.ASSIGNMENT_MATCH_CONFIDENCE)